@@ -1,15 +1,33 @@
+from collections import Counter
+
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Event, Country, Community, Profile, EventType, EventImage
+from .counters import adjust
+from .models import Event, Country, Community, CommunityGroup, Profile, EventType, EventImage, BackgroundJob
+from .occurrences import sync_event_occurrences
+from .search import query_terms, search_events
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ("title", "start_time", "end_time", "location", "country", "event_type", "is_deleted")
     list_filter = ("start_time", "location", "country", "event_type", "is_deleted")
-    search_fields = ("title", "description")
+    search_fields = ("title", "description", "location")
+
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index (see events.search) and rank the matches
+        if not query_terms(search_term):
+            return queryset, False
+        # order here, once the annotation exists; ChangeList keeps this
+        # ordering after its own (EventAdmin sets none)
+        return search_events(queryset, search_term, rank=True).order_by('-search_rank'), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # admins can edit dates and recurrence directly; refresh the calendar rows
+        sync_event_occurrences(obj)
 
 
 @admin.register(Country)
@@ -24,6 +42,15 @@ class CommunityAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+@admin.register(CommunityGroup)
+class CommunityGroupAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug", "parent")
+    list_filter = ("parent",)
+    search_fields = ("name", "slug")
+    prepopulated_fields = {"slug": ("name",)}
+    filter_horizontal = ("communities",)
+
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "country", "community")
@@ -67,8 +94,8 @@ class EventTypeAdmin(admin.ModelAdmin):
 
 @admin.register(EventImage)
 class EventImageAdmin(admin.ModelAdmin):
-    list_display = ("event", "filename", "uploaded_by", "created_at")
-    list_filter = ("created_at",)
+    list_display = ("event", "filename", "uploaded_by", "status", "created_at")
+    list_filter = ("status", "created_at")
     # allow admins to search by the event title, uploader username and the
     # stored file path / filename (image field stores the path as a string)
     search_fields = ("event__title", "uploaded_by__username", "image")
@@ -80,3 +107,22 @@ class EventImageAdmin(admin.ModelAdmin):
         except Exception:
             return ''
     filename.short_description = 'Filename'
+
+    # Event.images_count has no delete signal (it would disable fast deletes),
+    # so admin deletes adjust it like delete_selected_images does
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        adjust([obj.event_id], 'images_count', -1)
+
+    def delete_queryset(self, request, queryset):
+        per_event = Counter(queryset.values_list('event_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for event_id, count in per_event.items():
+            adjust([event_id], 'images_count', -count)
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "run_after", "created_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("kind", "payload", "attempts", "locked_at", "last_error", "created_at")
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_index(using, **kwargs):
+    from .search import install_search_index
+    connection = connections[using]
+    # nothing to index yet (e.g. after `migrate events zero`)
+    if 'events_event' in connection.introspection.table_names():
+        install_search_index(connection)
 
 
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        # register signal handlers (feed cache invalidation)
+        from . import signals  # noqa: F401
+        # SQLite drops the search triggers whenever Django rebuilds events_event
+        # during a migration; put them back after every migrate
+        post_migrate.connect(_ensure_search_index, sender=self)
@@ -0,0 +1,184 @@
+"""ZIP archives of event photos: streaming builder and on-disk cache.
+
+`stream_zip` produces the archive as a sequence of byte chunks while the
+source files are read in ZIP_CHUNK_SIZE pieces, so memory use is bounded
+by the chunk size instead of the archive size and the response can start
+before the last photo is read.
+
+Archives for a given set of images are also built once in the background
+and kept under ARCHIVE_CACHE_DIR, keyed by the event and the ids and
+content hashes of the images (`archive_key`). Any gallery change drops the
+event's cached archives, and the directory is trimmed least-recently-used
+first to ARCHIVE_CACHE_MAX_BYTES.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.utils import timezone
+
+# bytes read from storage per step
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# formats that are already compressed; deflating them only burns CPU
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic', '.heif', '.avif'}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file object that buffers what ZipFile writes.
+
+    ZipFile notices the missing seek()/tell() and switches to data
+    descriptors, so entries are written front to back without rewinding.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_info(arcname, created_at):
+    if created_at is not None and timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    date_time = created_at.timetuple()[:6] if created_at else (1980, 1, 1, 0, 0, 0)
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    _, ext = os.path.splitext(arcname)
+    info.compress_type = zipfile.ZIP_STORED if ext.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    return info
+
+
+def archive_name(img, existing):
+    """Return a unique name for `img` inside an archive, recording it in `existing`."""
+    fname = os.path.basename(img.image.name)
+    # avoid duplicate names inside the archive
+    arcname = fname if fname not in existing else f"{img.id}-{fname}"
+    existing.add(arcname)
+    return arcname
+
+
+def stream_zip(images, chunk_size=ZIP_CHUNK_SIZE):
+    """Yield a ZIP archive of the given EventImage objects as byte chunks.
+
+    Files that can't be opened are skipped, like the old in-memory builder did.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as zf:
+        existing = set()
+        for img in images:
+            try:
+                fh = img.image.open('rb')
+            except Exception:
+                # skip files we can't read and continue
+                continue
+            with fh:
+                info = _zip_info(archive_name(img, existing), img.created_at)
+                with zf.open(info, 'w') as dest:
+                    for chunk in iter(lambda: fh.read(chunk_size), b''):
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # central directory
+    yield sink.drain()
+
+
+def archive_cache_dir():
+    # inside MEDIA_ROOT by default so the proxy delivery modes can reach it
+    return getattr(settings, 'ARCHIVE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'archives'))
+
+
+def archive_cache_max_bytes():
+    return getattr(settings, 'ARCHIVE_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+
+def archive_key(images):
+    """Cache key for an archive of `images` (iterable of (id, content_hash, name))."""
+    h = hashlib.sha256()
+    for pk, content_hash, name in sorted(images):
+        # the name changes when processing replaces the uploaded file
+        h.update(f"{pk}:{content_hash}:{name};".encode('utf-8'))
+    return h.hexdigest()
+
+
+def cached_archive_path(event_id, key):
+    return os.path.join(archive_cache_dir(), str(event_id), f"{key}.zip")
+
+
+def get_cached_archive(event_id, key):
+    """Return the path of a built archive, marking it recently used, or None."""
+    path = cached_archive_path(event_id, key)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def build_cached_archive(event_id, key, images):
+    """Write the archive of `images` for `key` into the cache and trim the cache."""
+    path = cached_archive_path(event_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # build beside the final name and rename, so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in stream_zip(images):
+                out.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    enforce_archive_cache_limit()
+    return path
+
+
+def invalidate_event_archives(event_id):
+    """Drop every cached archive of an event (its gallery changed)."""
+    shutil.rmtree(os.path.join(archive_cache_dir(), str(event_id)), ignore_errors=True)
+
+
+def enforce_archive_cache_limit(max_bytes=None):
+    """Delete least recently used archives until the cache fits in `max_bytes`."""
+    max_bytes = archive_cache_max_bytes() if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(archive_cache_dir()):
+        for name in files:
+            if not name.endswith('.zip'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    # get_cached_archive bumps mtime on every hit, so oldest mtime = least recently used
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+
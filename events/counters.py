@@ -0,0 +1,71 @@
+"""Denormalized participant/attendee/image counts on Event.
+
+The counters change with single-statement `F()` updates, so concurrent
+joins or uploads never overwrite each other. `events.signals` calls
+`adjust` from m2m_changed (participants, attendees) and EventImage
+post_save/post_delete; code that bypasses signals (bulk_create) calls it
+directly. `reconcile_counters` recomputes them from the source tables.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Event, EventImage
+
+# counter field -> (model holding the rows, its FK column to Event)
+COUNTER_SOURCES = {
+    'participants_count': (Event.participants.through, 'event_id'),
+    'attendees_count': (Event.attendees.through, 'event_id'),
+    'images_count': (EventImage, 'event_id'),
+}
+
+# counter field -> m2m through model whose changes it follows
+M2M_COUNTERS = {
+    Event.participants.through: 'participants_count',
+    Event.attendees.through: 'attendees_count',
+}
+
+
+def adjust(event_ids, field, delta):
+    """Add `delta` to `field` of each event in `event_ids`."""
+    if not delta or not event_ids:
+        return
+    # never below zero, even if the counter had drifted
+    Event.objects.filter(pk__in=set(event_ids)).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def _actual(field):
+    model, fk = COUNTER_SOURCES[field]
+    rows = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows), 0)
+
+
+def reconcile_counters(batch_size=500, progress=None):
+    """Recompute every counter that drifted, in batches of events.
+
+    Returns the number of events repaired. Each repair is one UPDATE that
+    recounts inside the statement, so it can't race with concurrent F()
+    updates.
+    """
+    repaired = 0
+    last_pk = 0
+    actual = {field: _actual(field) for field in COUNTER_SOURCES}
+    while True:
+        ids = list(Event.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_pk = ids[-1]
+        drift = Q()
+        for field in COUNTER_SOURCES:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = list(
+            Event.objects.filter(pk__in=ids)
+            .annotate(**{f'actual_{field}': expr for field, expr in actual.items()})
+            .filter(drift)
+            .values_list('pk', flat=True)
+        )
+        if drifted:
+            Event.objects.filter(pk__in=drifted).update(**actual)
+            repaired += len(drifted)
+        if progress:
+            progress(last_pk, repaired)
+    return repaired
@@ -0,0 +1,79 @@
+"""Pluggable delivery of media files and archives.
+
+Views decide *whether* a file may be served; `serve_file` decides *how*.
+With `settings.MEDIA_DELIVERY`:
+
+- 'x-accel-redirect' (nginx): respond with an empty body and an
+  `X-Accel-Redirect` header pointing at MEDIA_ACCEL_PREFIX + the path
+  relative to MEDIA_ROOT; nginx serves the bytes from an `internal`
+  location.
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd): respond with an
+  `X-Sendfile` header carrying the absolute path.
+- 'python' (default): stream the file with FileResponse, which hands it to
+  the server's wsgi.file_wrapper (os.sendfile under gunicorn/uWSGI).
+"""
+import mimetypes
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+
+DELIVERY_MODES = ('python', 'x-accel-redirect', 'x-sendfile')
+
+
+def delivery_mode():
+    mode = getattr(settings, 'MEDIA_DELIVERY', 'python')
+    return mode if mode in DELIVERY_MODES else 'python'
+
+
+def _content_disposition(filename, as_attachment):
+    kind = 'attachment' if as_attachment else 'inline'
+    return f'{kind}; filename="{filename}"'
+
+
+def serve_file(path, filename=None, as_attachment=False, content_type=None):
+    """Return a response delivering the file at absolute filesystem `path`.
+
+    Raises Http404 when it doesn't exist. In the proxy modes the file must
+    live under MEDIA_ROOT (X-Accel-Redirect) or wherever the proxy is
+    allowed to read (X-Sendfile).
+    """
+    if not os.path.isfile(path):
+        raise Http404('File not found')
+    filename = filename or os.path.basename(path)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = delivery_mode()
+
+    if mode == 'python':
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            rel = os.path.relpath(path, settings.MEDIA_ROOT)
+            if rel.startswith('..'):
+                raise Http404('File not found')
+            prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + rel.replace(os.sep, '/')
+        else:
+            response['X-Sendfile'] = path
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    return response
+
+
+def serve_field_file(field_file, filename=None, as_attachment=False):
+    """Deliver a FileField value, falling back to streaming for non-local storages."""
+    if not field_file:
+        raise Http404('File not found')
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        # remote storage (S3 etc.) has no local path: stream through Django
+        try:
+            fh = field_file.storage.open(field_file.name, 'rb')
+        except OSError:
+            raise Http404('File not found')
+        name = filename or os.path.basename(field_file.name)
+        response = FileResponse(fh, content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response['Content-Disposition'] = _content_disposition(name, as_attachment)
+        return response
+    return serve_file(path, filename=filename, as_attachment=as_attachment)
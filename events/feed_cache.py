@@ -0,0 +1,120 @@
+"""Versioned cache for the shared part of the calendar JSON feed.
+
+A cached feed body depends on the scope it was built for: every event
+("all"), one country, one community, or a community group. Each
+scope has a version counter stored in the cache; a body's key embeds the
+current versions of its scopes, so bumping a counter makes every body
+built for that scope unreachable without having to find and delete it.
+Signals in `events.signals` bump the counters whenever an event, its
+targeted communities or its participants change, once the change commits.
+
+Bodies never contain per-user data; the view merges the "joined" flag in
+after fetching them, so one entry serves every visitor.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# cached bodies are invalidated explicitly; the timeout only bounds staleness of
+# the "no window" requests whose recurrence horizon is relative to now
+FEED_CACHE_TIMEOUT = 60 * 60
+
+_VERSION_PREFIX = 'events_feed:version:'
+_BODY_PREFIX = 'events_feed:body:'
+
+
+def _fresh_version():
+    # seed counters from the clock so a counter evicted from the cache never
+    # comes back with a value an older body was keyed on
+    return int(time.time() * 1000)
+
+
+def scopes_for(country_id, community):
+    """Return the scope names a feed filtered by country/community depends on."""
+    scopes = []
+    if country_id is not None:
+        scopes.append(f'country:{country_id}')
+    if community is not None:
+        scopes.append(f'community:{community}')
+    return scopes or ['all']
+
+
+def _versions(scopes):
+    keys = [_VERSION_PREFIX + s for s in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_version(), None)
+            found[key] = cache.get(key)
+        versions.append(str(found[key]))
+    return versions
+
+
+def feed_cache_key(country_id, community, window_start, window_end):
+    """Build the cache key for a feed body, including its scopes' versions."""
+    versions = _versions(scopes_for(country_id, community))
+    raw = '|'.join([
+        str(country_id),
+        str(community),
+        window_start.isoformat() if window_start else '',
+        window_end.isoformat() if window_end else '',
+        '.'.join(versions),
+    ])
+    return _BODY_PREFIX + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def bump(scopes):
+    """Advance the version counter of each scope once the current transaction commits.
+
+    Bumping earlier would let a concurrent request read the pre-commit rows
+    and cache that stale body under the new version. Outside a transaction
+    the counters move immediately.
+    """
+    scopes = set(scopes)
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def _bump_now(scopes):
+    for scope in scopes:
+        key = _VERSION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            # counter missing (never read or evicted): start a fresh one
+            cache.set(key, _fresh_version(), None)
+
+
+def invalidate_event(event, community_ids=None, country_ids=()):
+    """Bump every scope whose feed can contain `event`.
+
+    `community_ids` defaults to the event's current targeted communities;
+    `country_ids` lists extra countries (e.g. the one it was moved away from).
+    """
+    scopes = ['all']
+    for cid in (event.country_id, *country_ids):
+        if cid is not None:
+            scopes.append(f'country:{cid}')
+    if community_ids is None:
+        community_ids = list(event.targeted_communities.values_list('id', flat=True)) if event.pk else []
+    scopes.extend(community_scopes(community_ids))
+    bump(scopes)
+
+
+def community_scopes(community_ids):
+    """Scopes for a set of communities, including every group that contains them."""
+    from .reference import reference_data
+
+    # group filters use their slug as the community value (see views._feed_params)
+    groups = reference_data().community_group_slugs
+    scopes = [f'community:{cid}' for cid in community_ids]
+    for cid in community_ids:
+        scopes.extend(f'community:{slug}' for slug in groups.get(cid, ()))
+    return scopes
+
+
+def group_scopes(slugs):
+    """Scopes of the feeds filtered by the given community groups."""
+    return [f'community:{slug}' for slug in slugs]
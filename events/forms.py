@@ -2,6 +2,8 @@ from django import forms
 from .models import Event
 from .models import Country, Community, Profile, EventImage
 from .models import EventType
+from .occurrences import sync_event_occurrences
+from .reference import reference_data
 from datetime import datetime, time
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
@@ -41,6 +43,11 @@ class EventForm(forms.ModelForm):
         # accept instance and optional `user` kwarg to control which fields are shown
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        # options from the cached reference data instead of a query per render;
+        # a submitted value is still validated against the table
+        self.fields['country'].choices = [('', self.fields['country'].empty_label)] + [
+            (c.pk, str(c)) for c in reference_data().countries
+        ]
         if self.instance and self.instance.pk:
             st = self.instance.start_time
             en = self.instance.end_time
@@ -143,7 +150,11 @@ class EventForm(forms.ModelForm):
         # set model's DateTimeFields from combined fields
         self.instance.start_time = self.cleaned_data['start_time']
         self.instance.end_time = self.cleaned_data['end_time']
-        return super().save(commit=commit)
+        ev = super().save(commit=commit)
+        if commit:
+            # keep the materialized calendar rows in step with the new dates
+            sync_event_occurrences(ev)
+        return ev
 
 
 class RegistrationForm(UserCreationForm):
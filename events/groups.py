@@ -0,0 +1,41 @@
+"""Community group hierarchy: closure table maintenance and resolution.
+
+CommunityGroupClosure stores every (ancestor, descendant) pair of the
+group tree, so "all communities under this group" is a single indexed
+join instead of a recursive walk. Groups are few and edited rarely, so the
+closure is simply recomputed from the parent links whenever one changes
+(see `events.signals`).
+"""
+from django.db import transaction
+
+from .models import CommunityGroup, CommunityGroupClosure
+
+
+@transaction.atomic
+def rebuild_group_closure():
+    """Recompute CommunityGroupClosure from CommunityGroup.parent."""
+    parents = dict(CommunityGroup.objects.values_list('id', 'parent_id'))
+    rows = []
+    for gid in parents:
+        # walk up to the root; `seen` guards against a cycle slipping past validation
+        node, depth, seen = gid, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append(CommunityGroupClosure(ancestor_id=node, descendant_id=gid, depth=depth))
+            node, depth = parents.get(node), depth + 1
+    CommunityGroupClosure.objects.all().delete()
+    CommunityGroupClosure.objects.bulk_create(rows)
+
+
+def group_memberships():
+    """Return {group id: set of community ids} covering each group and its subgroups.
+
+    One query over the closure table joined to the groups' communities.
+    """
+    members = {gid: set() for gid in CommunityGroup.objects.values_list('id', flat=True)}
+    rows = CommunityGroupClosure.objects.filter(
+        descendant__communities__isnull=False,
+    ).values_list('ancestor_id', 'descendant__communities')
+    for ancestor_id, community_id in rows:
+        members.setdefault(ancestor_id, set()).add(community_id)
+    return members
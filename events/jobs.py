@@ -0,0 +1,142 @@
+"""Database-backed background job queue.
+
+Views call `enqueue()` to record work in the BackgroundJob table; the
+`run_worker` management command claims due jobs and runs them in a
+process pool through `run_job()`. Handlers are registered per job kind
+with `@job_handler` and run inside a transaction unless registered with
+atomic=False (long jobs that only touch files). A handler that raises is retried with exponential
+backoff up to MAX_ATTEMPTS; raising PermanentJobError fails the job
+immediately.
+"""
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+MAX_ATTEMPTS = 5
+# first retry delay; doubles with each attempt
+RETRY_BACKOFF = timedelta(seconds=30)
+# a running job whose worker died is handed out again after this long
+JOB_LOCK_TIMEOUT = timedelta(minutes=15)
+
+_HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (e.g. an unreadable file)."""
+
+
+def job_handler(kind, atomic=True):
+    """Register the decorated function as the handler for jobs of `kind`.
+
+    With atomic=False the handler runs outside a transaction, for long jobs
+    that would otherwise hold one open while they only write files.
+    """
+    def register(func):
+        func.atomic_job = atomic
+        _HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, **payload):
+    """Queue a job of `kind` with `payload` as its keyword arguments."""
+    return BackgroundJob.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(kind, payloads):
+    """Queue one job of `kind` per payload dict with a single INSERT."""
+    return BackgroundJob.objects.bulk_create([BackgroundJob(kind=kind, payload=p) for p in payloads])
+
+
+def claim_jobs(limit):
+    """Mark up to `limit` due jobs as running and return their ids.
+
+    Each job is claimed with a conditional UPDATE, so several workers can
+    poll the same table without running a job twice.
+    """
+    now = timezone.now()
+    due = (
+        Q(status='queued', run_after__lte=now)
+        | Q(status='running', locked_at__lt=now - JOB_LOCK_TIMEOUT)
+    )
+    candidates = BackgroundJob.objects.filter(due).order_by('run_after', 'id').values_list('id', 'status')[:limit]
+    claimed = []
+    for job_id, status in candidates:
+        won = BackgroundJob.objects.filter(pk=job_id, status=status).filter(due).update(
+            status='running', locked_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(job_id)
+    return claimed
+
+
+def run_job(job_id):
+    """Execute a claimed job and record the outcome. Returns the final status."""
+    _load_handlers()
+    job = BackgroundJob.objects.get(pk=job_id)
+    handler = _HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"no handler registered for {job.kind!r}")
+        with transaction.atomic() if getattr(handler, 'atomic_job', True) else nullcontext():
+            handler(**job.payload)
+    except Exception as exc:
+        return _record_failure(job, traceback.format_exc(), permanent=isinstance(exc, PermanentJobError))
+
+    job.status = 'done'
+    job.locked_at = None
+    job.save(update_fields=['status', 'locked_at'])
+    return job.status
+
+
+def release_jobs(job_ids, error):
+    """Give back jobs whose worker died without recording an outcome.
+
+    Each is retried with backoff like a job that raised, or failed once it
+    used up its attempts (a job that keeps crashing its process must not be
+    handed out forever). Returns {job id: new status}.
+    """
+    _load_handlers()
+    return {
+        job.pk: _record_failure(job, error)
+        for job in BackgroundJob.objects.filter(pk__in=job_ids, status='running')
+    }
+
+
+def _record_failure(job, error, permanent=False):
+    job.last_error = error
+    if permanent or job.attempts >= MAX_ATTEMPTS:
+        job.status = 'failed'
+    else:
+        job.status = 'queued'
+        job.run_after = timezone.now() + RETRY_BACKOFF * (2 ** (job.attempts - 1))
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_after', 'locked_at', 'last_error'])
+    if job.status == 'failed':
+        _on_failure(job)
+    return job.status
+
+
+def _on_failure(job):
+    # let handlers that track state elsewhere (e.g. EventImage.status) record it
+    hook = getattr(_HANDLERS.get(job.kind), 'on_failure', None)
+    if hook:
+        hook(**job.payload)
+
+
+def _load_handlers():
+    # handlers live next to the code they serve; importing registers them
+    from . import tasks  # noqa: F401
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Delete done jobs older than `older_than`; returns the number removed."""
+    cutoff = timezone.now() - older_than
+    deleted, _ = BackgroundJob.objects.filter(status='done', created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,85 @@
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from events.models import Event, EventOccurrence
+from events.occurrences import OCCURRENCE_HORIZON, expected_occurrences
+from events.views import events_json
+
+
+class Command(BaseCommand):
+    help = ("Compare peak memory and time to first byte of the buffered and the streamed (?stream=1) "
+            "calendar feed over synthetic multi-day events. Everything is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=5000, help='Synthetic events to create (default: 5000)')
+        parser.add_argument('--days', type=int, default=3, help='Calendar days each event spans (default: 3)')
+        parser.add_argument('--window', type=int, default=90, help='Days covered by the feed request (default: 90)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            first_day = self._populate(max(options['events'], 1), max(options['days'], 1), max(options['window'], 1))
+            params = {
+                'start': first_day.isoformat(),
+                'end': (first_day + timedelta(days=options['window'])).isoformat(),
+            }
+            self.stdout.write(f"{'mode':<10}{'entries':>10}{'first byte ms':>16}{'total ms':>12}{'peak MiB':>11}")
+            for mode, extra in (('buffered', {}), ('streamed', {'stream': '1'})):
+                cache.clear()
+                self._report(mode, *self._measure(dict(params, **extra)))
+            transaction.set_rollback(True)
+
+    def _populate(self, count, days, window):
+        start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        events = Event.objects.bulk_create([
+            Event(
+                title=f'Benchmark event {i}',
+                description='Synthetic event created by benchmark_feed. ' * 4,
+                location=f'Hall {i % 40}',
+                start_time=start + timedelta(days=i % window, minutes=i % 600),
+                end_time=start + timedelta(days=i % window + days - 1, minutes=i % 600 + 90),
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        until = timezone.now() + OCCURRENCE_HORIZON
+        EventOccurrence.objects.bulk_create([
+            EventOccurrence(event=ev, start_time=s, end_time=e, day=d)
+            for ev in events
+            for s, e, d in expected_occurrences(ev, until)
+        ], batch_size=1000)
+        self.stdout.write(f"Created {count} events spanning {days} days each.")
+        return start.date()
+
+    def _measure(self, params):
+        request = RequestFactory().get('/events-json/', params)
+        request.user = AnonymousUser()
+        tracemalloc.start()
+        began = time.perf_counter()
+        response = events_json(request)
+        if response.streaming:
+            chunks = iter(response.streaming_content)
+            body = next(chunks, b'')
+            first_byte = time.perf_counter() - began
+            size = len(body)
+            entries = body.count(b'"orig_id"')
+            for chunk in chunks:
+                size += len(chunk)
+                entries += chunk.count(b'"orig_id"')
+        else:
+            # the whole body exists before any of it can be sent
+            first_byte = time.perf_counter() - began
+            entries = response.content.count(b'"orig_id"')
+        total = time.perf_counter() - began
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return entries, first_byte, total, peak
+
+    def _report(self, mode, entries, first_byte, total, peak):
+        self.stdout.write(f"{mode:<10}{entries:>10}{first_byte * 1000:>16.1f}{total * 1000:>12.1f}{peak / 2**20:>11.1f}")
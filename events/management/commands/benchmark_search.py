@@ -0,0 +1,87 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from events.models import Event
+from events.search import search_events
+
+# every title starts with one of these
+KINDS = (
+    'concert festival workshop meetup hackathon lecture exhibition market fair marathon '
+    'jazz rock opera theatre cinema poetry robotics python django startup'
+).split()
+
+CITIES = ('Cluj', 'Iasi', 'Timisoara', 'Brasov', 'Sibiu', 'Oradea', 'Constanta', 'Craiova')
+
+# ~1700 made-up words drawn with Zipf frequencies, as words are in real text
+SYLLABLES = ('ka', 'lo', 'mi', 'ra', 'ten', 'vor', 'sel', 'du', 'pin', 'gar', 'bel', 'no')
+VOCABULARY = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+# a kind, a kind plus a word, a frequent, a mid-frequency and a rare word, a prefix, word + city
+QUERIES = (
+    'concert', f'festival {VOCABULARY[3]}', VOCABULARY[5], VOCABULARY[200], VOCABULARY[1500], 'robo', f'{VOCABULARY[20]} sibiu',
+)
+
+
+class Command(BaseCommand):
+    help = ("Time free-text event search over synthetic events: the full-text index (events.search) "
+            "against the old icontains filters. The events are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000, help='Synthetic events to create (default: 1000000)')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per INSERT batch (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query, best is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(max(options['events'], 1), max(options['batch_size'], 1))
+            repeat = max(options['repeat'], 1)
+            self.stdout.write(f"{'query':<20}{'matches':>9}{'icontains ms':>15}{'index ms':>11}")
+            for query in QUERIES:
+                legacy = self._best(lambda: self._icontains(query), repeat)
+                indexed = self._best(lambda: self._indexed(query), repeat)
+                self.stdout.write(f"{query:<20}{indexed[1]:>9}{legacy[0] * 1000:>15.1f}{indexed[0] * 1000:>11.1f}")
+            transaction.set_rollback(True)
+
+    def _populate(self, count, batch_size):
+        rng = random.Random(0)
+        start = timezone.now() - timedelta(days=365)
+        began = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Event.objects.bulk_create([
+                Event(
+                    title=' '.join([rng.choice(KINDS), *rng.choices(VOCABULARY, WEIGHTS, k=2)]).capitalize(),
+                    description=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=20)),
+                    location=f'{rng.choice(CITIES)} {rng.choice(VOCABULARY)} hall',
+                    start_time=start + timedelta(minutes=i),
+                    end_time=start + timedelta(minutes=i + 90),
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        self.stdout.write(f"Inserted {count} events in {time.perf_counter() - began:.1f}s (index kept in sync).")
+
+    def _icontains(self, query):
+        # what participated_view/organized_view and the admin did before the index
+        q = Q()
+        for term in query.split():
+            q &= Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+        qs = Event.objects.filter(q, is_deleted=False)
+        return list(qs.order_by('-start_time')[:20]), qs.count()
+
+    def _indexed(self, query):
+        qs = search_events(Event.objects.filter(is_deleted=False), query, rank=True)
+        return list(qs.order_by('-search_rank')[:20]), qs.count()
+
+    def _best(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            _, matches = run()
+            timings.append(time.perf_counter() - began)
+        return min(timings), matches
@@ -0,0 +1,85 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image
+
+from events.models import Event, EventImage
+from events.uploads import store_uploads
+
+
+class Command(BaseCommand):
+    help = ("Measure upload throughput on N synthetic JPEGs: the batched store_uploads path against "
+            "one EventImage.save() per file. Files go to a temporary MEDIA_ROOT and rows are rolled back. "
+            "--storage-latency adds a delay to every storage call, as a remote backend (S3 etc.) would.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=50, help='Images per upload (default: 50)')
+        parser.add_argument('--size', type=int, default=1600, help='Width in pixels of each image (default: 1600)')
+        parser.add_argument('--rounds', type=int, default=3, help='Uploads timed per path (default: 3)')
+        parser.add_argument('--storage-latency', type=float, default=0.0,
+                            help='Milliseconds added to each storage exists/save call (default: 0)')
+
+    def handle(self, *args, **options):
+        count = max(options['files'], 1)
+        rounds = max(options['rounds'], 1)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root), ExitStack() as stack:
+            if options['storage_latency'] > 0:
+                self._add_latency(stack, options['storage_latency'] / 1000)
+            with transaction.atomic():
+                start = timezone.now() + timedelta(days=1)
+                event = Event.objects.create(title='Upload benchmark', start_time=start, end_time=start + timedelta(hours=1))
+                self.stdout.write(f"{'path':<16}{'files':>7}{'MiB':>8}{'seconds':>10}{'files/s':>10}{'MiB/s':>9}")
+                serial = batched = 0
+                for r in range(rounds):
+                    # fresh bytes every time, or the batched path would skip them as duplicates
+                    files = self._images(count, options['size'], seed=2 * r)
+                    serial += self._run('per-file save', files, lambda fs: self._save_each(event, fs))
+                    files = self._images(count, options['size'], seed=2 * r + 1)
+                    batched += self._run('store_uploads', files, lambda fs: store_uploads(event, fs, None))
+                self.stdout.write(self.style.SUCCESS(f"store_uploads throughput relative to per-file save: {serial / batched:.2f}x"))
+                transaction.set_rollback(True)
+
+    def _add_latency(self, stack, seconds):
+        # every round trip to the storage backend waits, for both paths alike
+        storage = EventImage._meta.get_field('image').storage
+        for method in ('exists', '_save'):
+            original = getattr(storage, method)
+
+            def delayed(*args, _original=original, **kwargs):
+                time.sleep(seconds)
+                return _original(*args, **kwargs)
+
+            stack.enter_context(mock.patch.object(storage, method, delayed))
+
+    def _images(self, count, width, seed):
+        height = width * 3 // 4
+        files = []
+        for i in range(count):
+            # noise compresses like a photo, unlike a flat colour
+            im = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+            buf = io.BytesIO()
+            im.save(buf, 'JPEG', quality=85)
+            files.append(SimpleUploadedFile(f'bench-{seed}-{i}.jpg', buf.getvalue(), content_type='image/jpeg'))
+        return files
+
+    def _save_each(self, event, files):
+        for f in files:
+            EventImage(event=event, image=f).save()
+
+    def _run(self, label, files, upload):
+        size = sum(f.size for f in files) / 2**20
+        began = time.perf_counter()
+        upload(files)
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f"{label:<16}{len(files):>7}{size:>8.1f}{elapsed:>10.2f}{len(files) / elapsed:>10.1f}{size / elapsed:>9.1f}")
+        return elapsed
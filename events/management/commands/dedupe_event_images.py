@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from events.models import EventImage
+from events.tasks import schedule_file_cleanup
+from events.uploads import FORMAT_EXTENSIONS, blob_locks, blob_name, file_digest
+
+
+class Command(BaseCommand):
+    help = "Move event photos stored before deduplication into the content-addressed blob store."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows loaded per batch (default: 200)')
+
+    def handle(self, *args, **options):
+        storage = EventImage._meta.get_field('image').storage
+        batch_size = max(options['batch_size'], 1)
+        last_pk = 0
+        moved = shared = failed = 0
+        while True:
+            batch = list(EventImage.objects.filter(pk__gt=last_pk, content_hash='').order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            old_names = []
+            for img in batch:
+                try:
+                    with img.image.open('rb') as fh:
+                        digest = file_digest(fh)
+                        fh.seek(0)
+                        with Image.open(fh) as im:
+                            fmt = im.format
+                        _, ext = os.path.splitext(img.image.name)
+                        name = blob_name(digest, FORMAT_EXTENSIONS.get(fmt, ext.lower()))
+                        if EventImage.objects.filter(event_id=img.event_id, content_hash=digest).exists():
+                            # the gallery already has this photo; the hash may be set only once per event
+                            self.stdout.write(f"  image {img.pk}: duplicate within its gallery, left as is")
+                            continue
+                        fh.seek(0)
+                        # the blob may be queued for deletion; hold it until the row references it
+                        with blob_locks([name]):
+                            if storage.exists(name):
+                                shared += 1
+                            else:
+                                name = storage.save(name, fh)
+                                moved += 1
+                            EventImage.objects.filter(pk=img.pk).update(image=name, content_hash=digest)
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"  image {img.pk}: {exc}")
+                    continue
+                old_names.append(img.image.name)
+            # old copies go through the worker, which skips paths still referenced
+            if old_names:
+                schedule_file_cleanup(old_names)
+            self.stdout.write(f"  up to image {last_pk}: {moved} copied, {shared} deduplicated")
+        self.stdout.write(self.style.SUCCESS(f"Done: {moved} copied, {shared} deduplicated, {failed} failed."))
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.models import EventImage
+from events.renditions import generate_renditions
+
+
+def _render(pk):
+    # each worker thread has its own DB connection; release it when done
+    try:
+        img = EventImage.objects.get(pk=pk)
+        generate_renditions(img)
+        return pk, None
+    except Exception as exc:
+        return pk, exc
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail/medium/WebP renditions for event images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Parallel workers (default: 4)')
+        parser.add_argument('--all', action='store_true', help='Regenerate renditions for every image')
+
+    def handle(self, *args, **options):
+        qs = EventImage.objects.all()
+        if not options['all']:
+            qs = qs.filter(thumbnail='')
+        ids = list(qs.order_by('pk').values_list('pk', flat=True))
+        if not ids:
+            self.stdout.write("Nothing to do.")
+            return
+
+        done = failed = 0
+        # Pillow releases the GIL while decoding and resizing, so threads scale
+        # across cores without re-initializing Django in subprocesses
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for future in as_completed(pool.submit(_render, pk) for pk in ids):
+                pk, exc = future.result()
+                if exc is None:
+                    done += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"  image {pk}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Generated renditions for {done} images ({failed} failed)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from events.targeting import rebuild_targeting
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized EventTargeting rows from Event.targeted_communities."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        total = rebuild_targeting(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} targeting rows."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from events.occurrences import rebuild_occurrences
+
+
+class Command(BaseCommand):
+    help = "Regenerate the materialized EventOccurrence rows for every event, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events loaded per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        total = rebuild_occurrences(
+            batch_size=batch_size,
+            progress=lambda n: self.stdout.write(f"  {n} events processed"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt occurrences for {total} events."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from events.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Create the event full-text search index if missing and refill it from the events table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias (default: "default")')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({connection.vendor})."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from events.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recount participants, attendees and images per event and fix counters that drifted, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events checked per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        repaired = reconcile_counters(
+            batch_size=max(options['batch_size'], 1),
+            progress=lambda last_pk, n: self.stdout.write(f"  up to event {last_pk}: {n} repaired"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Repaired counters on {repaired} events."))
@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from events import worker
+from events.jobs import claim_jobs, release_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (image processing etc.) in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help='Worker processes (default: CPU count)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        database_names = {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+        # a process that dies (e.g. a decoder crash) breaks the whole pool:
+        # give its jobs back and start a fresh one
+        while not self._serve(processes, database_names, options):
+            pass
+
+    def _serve(self, processes, database_names, options):
+        """Run jobs until drained (--once) or the pool breaks; returns False when it broke."""
+        # spawn rather than fork: children must not inherit the parent's DB sockets
+        ctx = multiprocessing.get_context('spawn')
+        running = {}
+        with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                                 initializer=worker.init_process, initargs=(database_names,)) as pool:
+            while True:
+                # keep every process busy with a small backlog
+                free = processes * 2 - len(running)
+                claimed = claim_jobs(free) if free > 0 else []
+                try:
+                    for job_id in claimed:
+                        running[pool.submit(worker.run, job_id)] = job_id
+                except BrokenProcessPool:
+                    self._release(running.values() | set(claimed))
+                    return False
+
+                if not running:
+                    if options['once']:
+                        return True
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        _, status = future.result()
+                        self.stdout.write(f"job {job_id}: {status}")
+                    except BrokenProcessPool:
+                        self._release({job_id, *running.values()})
+                        return False
+                    except Exception as exc:
+                        self.stderr.write(f"worker error: {exc}")
+                        self._release({job_id})
+
+    def _release(self, job_ids):
+        statuses = release_jobs(job_ids, 'worker process died while running the job')
+        for job_id, status in sorted(statuses.items()):
+            self.stderr.write(f"job {job_id}: worker died, {status}")
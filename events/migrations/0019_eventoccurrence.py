@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# keep in step with events.occurrences.OCCURRENCE_HORIZON
+OCCURRENCE_HORIZON = timedelta(days=731)
+BATCH_SIZE = 500
+
+
+def backfill(apps, schema_editor):
+    # the feed reads only EventOccurrence from now on; materialize existing events
+    from events.recurrence import is_recurring, iter_occurrences
+
+    Event = apps.get_model('events', 'Event')
+    EventOccurrence = apps.get_model('events', 'EventOccurrence')
+    until = timezone.now() + OCCURRENCE_HORIZON
+    last_pk = 0
+    while True:
+        events = list(Event.objects.filter(is_deleted=False, pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not events:
+            break
+        last_pk = events[-1].pk
+        rows = []
+        open_series = []
+        for ev in events:
+            bound = None
+            if is_recurring(ev) and (ev.recurrence_end_date is None or ev.recurrence_end_date > until.date()):
+                bound = until
+                open_series.append(ev.pk)
+            for occ_start, occ_end in iter_occurrences(ev, None, bound):
+                day = occ_start.date()
+                while day <= occ_end.date():
+                    rows.append(EventOccurrence(event_id=ev.pk, start_time=occ_start, end_time=occ_end, day=day))
+                    day += timedelta(days=1)
+        EventOccurrence.objects.bulk_create(rows, ignore_conflicts=True)
+        if open_series:
+            Event.objects.filter(pk__in=open_series).update(occurrences_until=until)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0018_event_public_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='occurrences_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('day', models.DateField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='events.event')),
+            ],
+            options={
+                'ordering': ['day', 'start_time'],
+                'indexes': [models.Index(fields=['day', 'start_time'], name='occurrence_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'start_time', 'day'), name='unique_event_occurrence_day')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0020_event_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='event_images/renditions/%Y/%m/%d'),
+        ),
+        migrations.AddField(
+            model_name='eventimage',
+            name='thumbnail_webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='event_images/renditions/%Y/%m/%d'),
+        ),
+        migrations.AddField(
+            model_name='eventimage',
+            name='medium',
+            field=models.ImageField(blank=True, editable=False, upload_to='event_images/renditions/%Y/%m/%d'),
+        ),
+        migrations.AddField(
+            model_name='eventimage',
+            name='medium_webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='event_images/renditions/%Y/%m/%d'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0023_eventimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventimage',
+            index=models.Index(fields=['event', 'created_at', 'id'], name='eventimage_gallery_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from events.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from events.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0024_eventimage_gallery_idx'),
+    ]
+
+    # FTS5 table + triggers on SQLite, generated tsvector column + GIN index on PostgreSQL
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
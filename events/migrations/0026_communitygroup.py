@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# the aggregate that used to be hard-coded in the views
+BUCHAREST_SECTORS = ['Sector 1', 'Sector 2', 'Sector 3', 'Sector 4', 'Sector 5', 'Sector 6']
+
+
+def create_bucharest_group(apps, schema_editor):
+    Community = apps.get_model('events', 'Community')
+    CommunityGroup = apps.get_model('events', 'CommunityGroup')
+    CommunityGroupClosure = apps.get_model('events', 'CommunityGroupClosure')
+    sectors = list(Community.objects.filter(name__in=BUCHAREST_SECTORS))
+    if not sectors:
+        return
+    group, _ = CommunityGroup.objects.get_or_create(slug='bucharest', defaults={'name': 'Bucharest'})
+    group.communities.add(*sectors)
+    CommunityGroupClosure.objects.get_or_create(ancestor=group, descendant=group, defaults={'depth': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0025_event_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('communities', models.ManyToManyField(blank=True, related_name='groups', to='events.community')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='events.communitygroup')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommunityGroupClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='events.communitygroup')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='events.communitygroup')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_group_closure')],
+            },
+        ),
+        migrations.RunPython(create_bucharest_group, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventTargeting = apps.get_model('events', 'EventTargeting')
+    through = Event.targeted_communities.through
+    rows = through.objects.values_list('event_id', 'community_id', 'event__start_time').order_by()
+    batch = []
+    for event_id, community_id, start_time in rows.iterator(chunk_size=1000):
+        batch.append(EventTargeting(event_id=event_id, community_id=community_id, start_time=start_time))
+        if len(batch) >= 1000:
+            EventTargeting.objects.bulk_create(batch)
+            batch = []
+    EventTargeting.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0026_communitygroup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTargeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.community')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='targeting', to='events.event')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['community', 'start_time', 'event'], name='targeting_community_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'community'), name='unique_event_targeting')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
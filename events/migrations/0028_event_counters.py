@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventImage = apps.get_model('events', 'EventImage')
+
+    def counted(model, fk='event_id'):
+        rows = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    Event.objects.update(
+        participants_count=counted(Event.participants.through),
+        attendees_count=counted(Event.attendees.through),
+        images_count=counted(EventImage),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0027_eventtargeting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='participants_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='attendees_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='images_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0028_event_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlobLock',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_duplicate_hashes(apps, schema_editor):
+    # the constraint cannot be added while a gallery holds the same photo
+    # twice; keep the hash on the oldest copy and leave the others unhashed
+    EventImage = apps.get_model('events', 'EventImage')
+    duplicates = (
+        EventImage.objects.exclude(content_hash='').order_by()
+        .values('event_id', 'content_hash').annotate(n=models.Count('id'), first=models.Min('id')).filter(n__gt=1)
+    )
+    for row in duplicates:
+        EventImage.objects.filter(event_id=row['event_id'], content_hash=row['content_hash']).exclude(
+            pk=row['first']
+        ).update(content_hash='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0029_bloblock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='eventimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('event', 'content_hash'), name='eventimage_unique_content'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+import django.db.models.deletion
+import events.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0030_eventimage_unique_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSearch',
+            fields=[
+                ('event', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='events.event')),
+                ('document', events.models.FullTextDocumentField(db_column='events_event_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'events_event_fts',
+                'managed': False,
+            },
+        ),
+    ]
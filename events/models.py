@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
 import uuid
 
 class Event(models.Model):
@@ -90,10 +92,72 @@ class Event(models.Model):
     # admin/form from requiring a positive integer when recurrence is disabled.
     recurrence_interval = models.PositiveIntegerField(null=True, blank=True, default=1, help_text='Interval for recurrence (e.g., every N days/weeks/months)')
     recurrence_end_date = models.DateField(null=True, blank=True, help_text='Optional end date for the recurrence')
+    # how far EventOccurrence rows have been generated for an open-ended series;
+    # NULL means every occurrence is materialized (or the event doesn't recur)
+    occurrences_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # denormalized counts, kept current with F() updates by events.counters;
+    # `reconcile_event_counters` repairs any drift
+    participants_count = models.PositiveIntegerField(default=0, editable=False)
+    attendees_count = models.PositiveIntegerField(default=0, editable=False)
+    images_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('participants_count', 'attendees_count', 'images_count')
+
+    class Meta:
+        # chosen against the listing queries in views.py: every list filters
+        # live (is_deleted=False) events and orders by start_time.
+        indexes = [
+            # myevents / participated / organized: is_deleted + end_time range, ordered by start_time
+            models.Index(fields=['is_deleted', 'start_time', 'end_time'], name='event_live_start_idx'),
+            # calendar feed country filter
+            models.Index(fields=['country', 'start_time'], condition=models.Q(is_deleted=False), name='event_country_start_idx'),
+            # "events I own" half of the owner/organizer OR
+            models.Index(fields=['owner', 'start_time'], condition=models.Q(is_deleted=False), name='event_owner_start_idx'),
+            # feed tail: series materialized only up to a horizon
+            models.Index(fields=['occurrences_until'], condition=models.Q(is_deleted=False, occurrences_until__isnull=False), name='event_open_series_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.start_time:%Y-%m-%d %H:%M}) [{self.public_id}]"
 
+    def save(self, *args, **kwargs):
+        # never write the in-memory counters back over an existing row: they may
+        # be stale, and the database copy is updated concurrently with F()
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS and f.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class EventOccurrence(models.Model):
+    """One calendar day of an event occurrence, materialized for the calendar feed.
+
+    Rows are derived from Event (multi-day spans and recurrence) by
+    `events.occurrences.sync_event_occurrences`; never edit them by hand.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrences')
+    # bounds of the whole occurrence this day belongs to
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    # the calendar day this row is rendered on
+    day = models.DateField()
+
+    class Meta:
+        ordering = ['day', 'start_time']
+        indexes = [
+            models.Index(fields=['day', 'start_time'], name='occurrence_day_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'start_time', 'day'], name='unique_event_occurrence_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.event.title} on {self.day:%Y-%m-%d}"
+
 
 class EventType(models.Model):
     """Admin-manageable preset types for events (e.g., Workshop, Meetup, Webinar)."""
@@ -108,8 +172,38 @@ class EventType(models.Model):
         return self.name
 
 
+class EventTargeting(models.Model):
+    """Denormalized copy of Event.targeted_communities, keyed for the feed.
+
+    One row per (community, event) with the event's start_time, indexed as
+    (community, start_time, event): "events targeting community X that
+    start before T" is a single index range scan, and filtering by
+    `event_id IN (...)` needs no DISTINCT. Maintained by `events.targeting`.
+    """
+    community = models.ForeignKey('Community', on_delete=models.CASCADE, related_name='+')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='targeting')
+    start_time = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['community', 'start_time', 'event'], name='targeting_community_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'community'], name='unique_event_targeting'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.community_id}"
+
+
 class EventImage(models.Model):
     """Image uploaded by users for a specific event."""
+    # uploads are stored raw and finished by the background worker (events.jobs)
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='event_images/%Y/%m/%d')
     uploaded_by = models.ForeignKey(
@@ -120,13 +214,103 @@ class EventImage(models.Model):
         related_name='uploaded_images'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready')
+    # SHA-256 of the uploaded bytes; rows with the same hash share one stored
+    # blob (see events.uploads), so files are only removed with their last row.
+    # Processing may point `image` at a normalized blob; the hash stays that of
+    # the upload, which is what duplicate uploads are recognised by
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+
+    # dimensions of the original (after EXIF orientation) and the downscaled
+    # renditions produced by events.renditions; blank until generated
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    thumbnail = models.ImageField(upload_to='event_images/renditions/%Y/%m/%d', blank=True, editable=False)
+    thumbnail_webp = models.ImageField(upload_to='event_images/renditions/%Y/%m/%d', blank=True, editable=False)
+    medium = models.ImageField(upload_to='event_images/renditions/%Y/%m/%d', blank=True, editable=False)
+    medium_webp = models.ImageField(upload_to='event_images/renditions/%Y/%m/%d', blank=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # gallery pages: newest first, keyset-paginated on (created_at, id)
+            models.Index(fields=['event', 'created_at', 'id'], name='eventimage_gallery_idx'),
+        ]
+        constraints = [
+            # a photo is in a gallery once; rows from before hashing have no hash yet
+            models.UniqueConstraint(
+                fields=['event', 'content_hash'], condition=~models.Q(content_hash=''),
+                name='eventimage_unique_content',
+            ),
+        ]
 
     def __str__(self):
         return f"Image for {self.event.title} by {self.uploaded_by or 'anonymous'}"
 
+    # variants served by the event_image_file view, mapped to their fields
+    FILE_VARIANTS = {
+        'original': 'image',
+        'thumbnail': 'thumbnail',
+        'thumbnail_webp': 'thumbnail_webp',
+        'medium': 'medium',
+        'medium_webp': 'medium_webp',
+    }
+
+    def file_url(self, variant='original'):
+        """URL of a stored variant, delivered through the permission-checked view."""
+        return reverse('event_image_file', args=[self.event_id, self.pk, variant])
+
+    @property
+    def url(self):
+        return self.file_url('original')
+
+    def original_visible_to(self, user):
+        """Whether `user` may fetch the original file.
+
+        Until processing has validated and stripped it, the original is only
+        shown to its uploader.
+        """
+        if self.status == 'ready':
+            return True
+        return bool(user and user.is_authenticated and self.uploaded_by_id == user.pk)
+
+    @property
+    def thumbnail_url(self):
+        return self.file_url('thumbnail') if self.thumbnail else self.url
+
+    @property
+    def filename(self):
+        return self.image.name.rsplit('/', 1)[-1]
+
+    def _scaled_width(self, max_width):
+        return min(self.width, max_width) if self.width else max_width
+
+    @property
+    def has_renditions(self):
+        return bool(self.thumbnail)
+
+    @property
+    def srcset(self):
+        """`srcset` value over the JPEG renditions (the original is never listed)."""
+        from .renditions import RENDITION_WIDTHS
+        if not self.has_renditions:
+            return ''
+        return ', '.join([
+            f"{self.file_url('thumbnail')} {self._scaled_width(RENDITION_WIDTHS['thumbnail'])}w",
+            f"{self.file_url('medium')} {self._scaled_width(RENDITION_WIDTHS['medium'])}w",
+        ])
+
+    @property
+    def webp_srcset(self):
+        """`srcset` value over the WebP renditions."""
+        from .renditions import RENDITION_WIDTHS
+        if not self.thumbnail_webp:
+            return ''
+        return ', '.join([
+            f"{self.file_url('thumbnail_webp')} {self._scaled_width(RENDITION_WIDTHS['thumbnail'])}w",
+            f"{self.file_url('medium_webp')} {self._scaled_width(RENDITION_WIDTHS['medium'])}w",
+        ])
+
 
 class Country(models.Model):
     """A country that users can select for their profile. Managed by admin."""
@@ -158,6 +342,65 @@ class Community(models.Model):
         return self.name
 
 
+class CommunityGroup(models.Model):
+    """A named set of communities (region, city, sectors...), nestable. Managed by admin.
+
+    Its `slug` is accepted wherever a community id is (calendar filter,
+    targeted communities) and stands for every community in the group and
+    its subgroups, resolved through CommunityGroupClosure.
+    """
+    name = models.CharField(max_length=200, unique=True)
+    # filter value; must not be all digits so it can't be confused with a community id
+    slug = models.SlugField(max_length=100, unique=True)
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='children'
+    )
+    communities = models.ManyToManyField(
+        'Community',
+        blank=True,
+        related_name='groups'
+    )
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.slug and self.slug.isdigit():
+            raise ValidationError({'slug': 'The slug must contain at least one letter.'})
+        # a group can't be nested under itself or one of its own subgroups
+        if self.parent_id and self.pk:
+            if self.parent_id == self.pk or CommunityGroupClosure.objects.filter(
+                ancestor_id=self.pk, descendant_id=self.parent_id
+            ).exists():
+                raise ValidationError({'parent': 'A group cannot be nested inside itself.'})
+
+
+class CommunityGroupClosure(models.Model):
+    """Every (ancestor, descendant) pair of the group tree, including (g, g) at depth 0.
+
+    Derived from CommunityGroup.parent by `events.groups.rebuild_group_closure`.
+    """
+    ancestor = models.ForeignKey(CommunityGroup, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(CommunityGroup, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_group_closure'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant} ({self.depth})"
+
+
 class Profile(models.Model):
     """Profile extension for User to store country and community choices."""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
@@ -167,3 +410,78 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"Profile for {self.user.username}"
+
+
+class BackgroundJob(models.Model):
+    """A unit of deferred work, executed by the `run_worker` management command.
+
+    `kind` selects the handler registered in events.jobs; `payload` holds its
+    arguments. Failed jobs are retried with backoff until MAX_ATTEMPTS.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+
+class BlobLock(models.Model):
+    """Lock row of one stored file, taken by events.uploads.blob_locks.
+
+    Writers reusing a shared blob and the cleanup job deleting it lock the
+    row for the rest of their transaction. Rows are kept once created, one
+    per blob path.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+
+    def __str__(self):
+        return self.name
+
+
+class FullTextDocumentField(models.TextField):
+    """The hidden FTS5 column named after its table, the left side of MATCH.
+
+    events.search registers the `match` lookup on it.
+    """
+
+
+class EventSearch(models.Model):
+    """The SQLite full-text index of events (events.search.FTS_TABLE), read-only.
+
+    Lets search_events join the index through the ORM. The table is created
+    by events.search rather than by migrations and exists only on SQLite.
+    """
+    event = models.OneToOneField(
+        Event,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry',
+    )
+    document = FullTextDocumentField(db_column='events_event_fts')
+    # bm25 score of the current MATCH; lower is better
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'events_event_fts'
@@ -0,0 +1,119 @@
+"""Maintenance of the materialized EventOccurrence table.
+
+Each Event is expanded into one EventOccurrence row per calendar day of
+each of its occurrences, so the calendar feed can read a day range with a
+single indexed scan. Rows are kept in sync per event by diffing what is
+stored against what the event currently describes; open-ended series are
+only materialized up to OCCURRENCE_HORIZON and rolled forward by the
+`rebuild_occurrences` management command.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .feed_cache import invalidate_event
+from .models import Event, EventOccurrence
+from .recurrence import iter_occurrences, is_recurring
+
+# how far ahead open-ended (or very long) series are materialized
+OCCURRENCE_HORIZON = timedelta(days=731)
+
+
+def _normalize(dt):
+    # form-built datetimes are naive; match what the database hands back
+    if settings.USE_TZ:
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt)
+        return dt.astimezone(dt_timezone.utc)
+    return dt
+
+
+def _materialize_bound(event, until):
+    """Return the datetime up to which `event` is expanded, or None for all of it."""
+    if not is_recurring(event):
+        return None
+    if event.recurrence_end_date is None or event.recurrence_end_date > until.date():
+        return until
+    return None
+
+
+def expected_occurrences(event, until):
+    """Return the set of (start, end, day) rows `event` should have.
+
+    Deleted events have none. Series running past `until` are cut there.
+    """
+    if event.is_deleted:
+        return set()
+    start = _normalize(event.start_time)
+    end = _normalize(event.end_time)
+    if start != event.start_time or end != event.end_time:
+        # work on a normalized copy so the caller's instance is untouched
+        event = Event(
+            start_time=start,
+            end_time=end,
+            recurrence_pattern=event.recurrence_pattern,
+            recurrence_interval=event.recurrence_interval,
+            recurrence_end_date=event.recurrence_end_date,
+        )
+    rows = set()
+    for occ_start, occ_end in iter_occurrences(event, None, _materialize_bound(event, until)):
+        day = occ_start.date()
+        while day <= occ_end.date():
+            rows.add((occ_start, occ_end, day))
+            day += timedelta(days=1)
+    return rows
+
+
+def sync_event_occurrences(event, now=None):
+    """Bring the stored occurrences of `event` in line with its current fields.
+
+    Only rows that changed are deleted or inserted, so re-saving an event
+    whose dates didn't move costs a single read.
+    """
+    until = (now or timezone.now()) + OCCURRENCE_HORIZON
+    wanted = expected_occurrences(event, until)
+    bound = None if event.is_deleted else _materialize_bound(event, until)
+
+    with transaction.atomic():
+        existing = {
+            (start, end, day): pk
+            for pk, start, end, day in EventOccurrence.objects.filter(event=event).values_list('pk', 'start_time', 'end_time', 'day')
+        }
+        stale = [pk for key, pk in existing.items() if key not in wanted]
+        if stale:
+            EventOccurrence.objects.filter(pk__in=stale).delete()
+        missing = wanted.difference(existing)
+        if missing:
+            EventOccurrence.objects.bulk_create(
+                [EventOccurrence(event=event, start_time=s, end_time=e, day=d) for s, e, d in sorted(missing)],
+                batch_size=500,
+            )
+        if stale or missing:
+            # the feed reads these rows; drop bodies built from the old ones
+            transaction.on_commit(lambda: invalidate_event(event))
+        if event.occurrences_until != bound:
+            Event.objects.filter(pk=event.pk).update(occurrences_until=bound)
+            event.occurrences_until = bound
+
+
+def rebuild_occurrences(batch_size=500, now=None, progress=None):
+    """Re-sync every event, walking the table in primary-key batches.
+
+    `progress`, when given, is called with the running count after each batch.
+    Returns the number of events processed.
+    """
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(Event.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        for ev in batch:
+            sync_event_occurrences(ev, now=now)
+        last_pk = batch[-1].pk
+        total += len(batch)
+        if progress:
+            progress(total)
+    return total
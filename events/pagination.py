@@ -0,0 +1,80 @@
+"""Keyset (seek) pagination helpers.
+
+Instead of OFFSET, a page continues after the sort key of the last row of
+the previous page, so every page costs one indexed range scan no matter
+how deep it is. The position is handed to clients as an opaque cursor.
+"""
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def encode_cursor(data):
+    """Encode JSON-serializable `data` as an opaque, URL-safe token."""
+    raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; returns None for missing or malformed tokens."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _json_value(value):
+    # full precision: DjangoJSONEncoder cuts datetimes to milliseconds, and a
+    # truncated key would skip the rows between it and the real value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def row_position(row, fields):
+    """The JSON-serializable sort key of `row`, as used for `position`."""
+    return [_json_value(getattr(row, f)) for f in fields]
+
+
+def _key_values(model, fields, values):
+    # cursor values travel as JSON; convert them back to the fields' Python types
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        return [model._meta.get_field(f).to_python(v) for f, v in zip(fields, values)]
+    except Exception:
+        return None
+
+
+def keyset_page(qs, fields, position=None, limit=20, descending=False):
+    """Return (rows, next_position) for the page of `qs` after `position`.
+
+    `fields` is the sort key; its last field must be unique (e.g. 'id').
+    `position` is the key of the last row already shown, as returned in
+    `next_position` by the previous call (None for the first page).
+    `next_position` is None on the last page.
+    """
+    qs = qs.order_by(*[('-' if descending else '') + f for f in fields])
+    values = _key_values(qs.model, fields, position) if position is not None else None
+    if values is not None:
+        # (a, b) after (x, y)  <=>  a > x OR (a = x AND b > y)
+        op = 'lt' if descending else 'gt'
+        after = Q()
+        equal = {}
+        for field, value in zip(fields, values):
+            after |= Q(**equal, **{f'{field}__{op}': value})
+            equal[field] = value
+        qs = qs.filter(after)
+
+    rows = list(qs[:limit + 1])
+    next_position = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_position = row_position(rows[-1], fields)
+    return rows, next_position
@@ -0,0 +1,104 @@
+"""Lazy expansion of recurring events into concrete occurrences.
+
+`Event.recurrence_pattern` / `recurrence_interval` / `recurrence_end_date`
+describe a series anchored at the event's own start/end times. The helpers
+here jump straight to the first occurrence that can overlap a requested
+window and only generate occurrences inside it, so the cost of viewing a
+month far in the future does not depend on how long ago the series started.
+
+Series are stepped in local wall-clock time (the current timezone), so a
+weekly 19:00 event stays at 19:00 after a daylight-saving change; each
+occurrence is converted back to the timezone of the event's start_time.
+"""
+import calendar
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+def is_recurring(event):
+    """True when the event has a recurrence pattern other than 'none'."""
+    return bool(event.recurrence_pattern) and event.recurrence_pattern != 'none'
+
+
+def _add_months(dt, months):
+    """Shift `dt` by whole months, clamping the day to the target month's length."""
+    month_index = dt.month - 1 + months
+    year = dt.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+def _wall_clock(dt):
+    """`dt` as a naive local time (naive datetimes are already local)."""
+    return timezone.localtime(dt).replace(tzinfo=None) if timezone.is_aware(dt) else dt
+
+
+def _local_date(dt):
+    # recurrence_end_date is picked by users in local time
+    return timezone.localtime(dt).date() if timezone.is_aware(dt) else dt.date()
+
+
+def iter_occurrences(event, window_start=None, window_end=None):
+    """Yield (start, end) datetimes for occurrences overlapping the window.
+
+    The window is half-open: an occurrence is included when it starts before
+    `window_end` and ends after `window_start`; either bound may be None.
+    Non-recurring events yield at most their single occurrence. The generator
+    is lazy, so an open-ended series with no `window_end` keeps yielding;
+    callers must bound the window or stop consuming.
+    """
+    start = event.start_time
+    duration = event.end_time - start
+
+    if not is_recurring(event):
+        if (window_end is None or start < window_end) and (window_start is None or event.end_time > window_start):
+            yield start, event.end_time
+        return
+
+    interval = max(event.recurrence_interval or 1, 1)
+    end_date = event.recurrence_end_date
+    pattern = event.recurrence_pattern
+    local_start = _wall_clock(start)
+
+    if timezone.is_aware(start):
+        def to_event_tz(local):
+            return timezone.make_aware(local).astimezone(start.tzinfo)
+    else:
+        def to_event_tz(local):
+            return local
+
+    # estimate the index of the first occurrence ending after window_start from
+    # the local distance, one step early (DST shifts are worth at most an hour)
+    lead = _wall_clock(window_start) - duration if window_start is not None else None
+    if pattern == 'monthly':
+        def nth(k):
+            return to_event_tz(_add_months(local_start, k * interval))
+
+        k = 0
+        if lead is not None:
+            months = (lead.year - local_start.year) * 12 + (lead.month - local_start.month)
+            k = max(months // interval - 1, 0)
+    else:
+        step = timedelta(days=interval * (7 if pattern == 'weekly' else 1))
+
+        def nth(k):
+            return to_event_tz(local_start + k * step)
+
+        k = 0
+        if lead is not None and lead >= local_start:
+            k = max((lead - local_start) // step - 1, 0)
+    # then step forward over the (at most few) occurrences that still end too early
+    if window_start is not None:
+        while nth(k) + duration <= window_start:
+            k += 1
+
+    while True:
+        occ_start = nth(k)
+        if window_end is not None and occ_start >= window_end:
+            return
+        if end_date is not None and _local_date(occ_start) > end_date:
+            return
+        yield occ_start, occ_start + duration
+        k += 1
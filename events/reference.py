@@ -0,0 +1,251 @@
+"""Per-process cache of the Country/Community reference data.
+
+Countries, communities and community groups are edited rarely (from the
+admin) but read on nearly every page: filter dropdowns, the
+targeted-communities picker and the expansion of group filter values. `reference_data()` loads them once per
+process and keeps them until the version counter in the shared cache
+changes; signals in `events.signals` bump that counter whenever a Country
+Community or CommunityGroup changes, and every process reloads on its next
+read. A steady-state read costs one cache lookup and no queries.
+
+The community/group dataset the calendar filters on client-side is also
+published as a content-hashed JSON file (`communities-<digest>.json`
+under REFERENCE_ASSET_DIR). Its URL changes whenever the data does, so it
+is served with immutable cache headers and browsers fetch it once per
+change instead of with every page.
+
+`profile_country_id(user)` caches the country of a user's profile, which
+the calendar uses as its default filter, so rendering it needs no query.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .groups import group_memberships
+from .models import Community, CommunityGroup, Country, Profile
+
+_VERSION_KEY = 'reference_data:version'
+_PROFILE_COUNTRY_PREFIX = 'profile_country:'
+
+# superseded asset files are kept this long for pages still referencing them
+ASSET_RETENTION = 7 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_loaded = {'version': None, 'data': None}
+
+
+class ReferenceData:
+    """Immutable snapshot of countries, communities and community groups.
+
+    Countries and communities are sorted by name; groups are in tree order
+    (each followed by its subgroups) and carry `depth`, `menu_label`,
+    `direct_communities` and `member_ids` (communities of the group and
+    all its subgroups, from the closure table).
+    """
+
+    def __init__(self, countries, communities, groups=(), direct_members=(), memberships=None):
+        self.countries = countries
+        self.communities = communities
+        self.country_ids = {c.id for c in countries}
+        self.community_ids = {c.id for c in communities}
+        self.communities_by_country = {}
+        for com in communities:
+            self.communities_by_country.setdefault(com.country_id, []).append(com)
+
+        memberships = memberships or {}
+        by_id = {c.id: c for c in communities}
+        direct = {}
+        for group_id, community_id in direct_members:
+            direct.setdefault(group_id, set()).add(community_id)
+        children = {}
+        for g in groups:
+            children.setdefault(g.parent_id, []).append(g)
+        self.groups = []
+
+        def walk(parent_id, depth, seen):
+            for g in children.get(parent_id, []):
+                if g.id in seen:
+                    continue
+                g.depth = depth
+                g.menu_label = '\u2003' * depth + g.name
+                g.direct_communities = [c for c in communities if c.id in direct.get(g.id, ())]
+                g.member_ids = sorted(i for i in memberships.get(g.id, ()) if i in by_id)
+                self.groups.append(g)
+                walk(g.id, depth + 1, seen | {g.id})
+        walk(None, 0, frozenset())
+
+        self.groups_by_slug = {g.slug: g for g in self.groups}
+        self.grouped_community_ids = {c.id for g in self.groups for c in g.direct_communities}
+        # community id -> slugs of every group (at any level) containing it
+        self.community_group_slugs = {}
+        for g in self.groups:
+            for cid in g.member_ids:
+                self.community_group_slugs.setdefault(cid, set()).add(g.slug)
+
+        # the client-side dataset calendar.html filters by country
+        self.communities_asset = json.dumps({
+            'communities': [{'id': c.id, 'name': c.name, 'country_id': c.country_id} for c in communities],
+            'groups': [
+                {
+                    'slug': g.slug,
+                    'name': g.name,
+                    'depth': g.depth,
+                    'communities': [c.id for c in g.direct_communities],
+                    'members': g.member_ids,
+                }
+                for g in self.groups
+            ],
+        }, separators=(',', ':')).encode('utf-8')
+        self.communities_digest = hashlib.sha256(self.communities_asset).hexdigest()[:16]
+
+    @property
+    def communities_asset_url(self):
+        return reverse('communities_asset', args=[self.communities_digest])
+
+    def communities_for(self, country_id):
+        """Communities of one country, or all of them when `country_id` is None."""
+        if country_id is None:
+            return self.communities
+        return self.communities_by_country.get(country_id, [])
+
+    def community_menu(self, country_id=None):
+        """Options for a community picker, limited to one country when given.
+
+        Returns {'groups': [(group, its direct communities)], 'ungrouped':
+        [communities in no group]}; groups without a community in the
+        country are left out.
+        """
+        communities = self.communities_for(country_id)
+        visible = {c.id for c in communities}
+        groups = [
+            (g, [c for c in g.direct_communities if c.id in visible])
+            for g in self.groups
+            if country_id is None or visible.intersection(g.member_ids)
+        ]
+        ungrouped = [c for c in communities if c.id not in self.grouped_community_ids]
+        return {'groups': groups, 'ungrouped': ungrouped}
+
+    def group_community_ids(self, slug):
+        """Ids of every community in the group `slug` and its subgroups (None if unknown)."""
+        group = self.groups_by_slug.get(slug)
+        return group.member_ids if group is not None else None
+
+
+def _current_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        # seeded from the clock so an evicted counter never repeats an old value
+        cache.add(_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def reference_data():
+    """Return the current ReferenceData, reloading it if another process bumped the version."""
+    version = _current_version()
+    data = _loaded['data']
+    if data is not None and _loaded['version'] == version:
+        return data
+    with _lock:
+        if _loaded['data'] is None or _loaded['version'] != version:
+            data = ReferenceData(
+                list(Country.objects.order_by('name')),
+                list(Community.objects.order_by('name')),
+                list(CommunityGroup.objects.order_by('name')),
+                list(CommunityGroup.communities.through.objects.values_list('communitygroup_id', 'community_id')),
+                group_memberships(),
+            )
+            publish_communities_asset(data)
+            _loaded['data'] = data
+            _loaded['version'] = version
+        return _loaded['data']
+
+
+def bump_reference_version():
+    """Make every process reload the reference data once the current transaction commits.
+
+    Bumping before the commit would let another process reload the old
+    rows and keep them under the new version.
+    """
+    transaction.on_commit(_bump_now)
+
+
+def _bump_now():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, int(time.time() * 1000), None)
+    # this process must not serve its copy even if the cache is a dummy backend
+    _loaded['data'] = None
+
+
+def profile_country_id(user):
+    """Country id of `user`'s profile (None when unset), cached per user."""
+    key = f'{_PROFILE_COUNTRY_PREFIX}{user.pk}'
+    cached = cache.get(key)
+    if cached is None:
+        # wrapped in a list so an unset country is cached too
+        cached = [Profile.objects.filter(user=user).values_list('country_id', flat=True).first()]
+        cache.set(key, cached, None)
+    return cached[0]
+
+
+def forget_profile_country(user_id):
+    """Drop the cached profile country of a user once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(f'{_PROFILE_COUNTRY_PREFIX}{user_id}'))
+
+
+def reference_asset_dir():
+    return getattr(settings, 'REFERENCE_ASSET_DIR', os.path.join(settings.MEDIA_ROOT, 'reference'))
+
+
+def communities_asset_path(digest):
+    return os.path.join(reference_asset_dir(), f'communities-{digest}.json')
+
+
+def publish_communities_asset(data):
+    """Write `data`'s communities file if it isn't there yet and prune stale ones.
+
+    Failures are ignored: the asset view can serve the current version
+    from memory.
+    """
+    path = communities_asset_path(data.communities_digest)
+    if os.path.exists(path):
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write beside the final name and rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data.communities_asset)
+        os.replace(tmp, path)
+        cutoff = time.time() - ASSET_RETENTION
+        for name in os.listdir(os.path.dirname(path)):
+            old = os.path.join(os.path.dirname(path), name)
+            if name.startswith('communities-') and old != path and os.path.getmtime(old) < cutoff:
+                os.unlink(old)
+    except OSError:
+        pass
+
+
+def expand_groups(posted):
+    """Replace group slugs in posted targeted_communities with their community ids."""
+    if 'targeted_communities' in posted:
+        vals = posted.getlist('targeted_communities')
+        ref = reference_data()
+        if any(v in ref.groups_by_slug for v in vals):
+            new_vals = []
+            for v in vals:
+                ids = ref.group_community_ids(v)
+                new_vals.extend([str(i) for i in ids] if ids is not None else [v])
+            # a community may be picked directly and through a group
+            posted.setlist('targeted_communities', list(dict.fromkeys(new_vals)))
+    return posted
@@ -0,0 +1,114 @@
+"""Downscaled renditions of uploaded event photos.
+
+Galleries show `EventImage.thumbnail` / `medium` (JPEG) and their WebP
+twins through `srcset` instead of the full-resolution original. Renditions
+are generated by the background worker after upload (see events.tasks) and
+can be backfilled with the `generate_renditions` management command.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .uploads import blob_locks, blob_name
+
+# maximum width in pixels of each rendition; originals are never upscaled
+RENDITION_WIDTHS = {
+    'thumbnail': 400,
+    'medium': 1200,
+}
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+RENDITION_FIELDS = ('thumbnail', 'thumbnail_webp', 'medium', 'medium_webp')
+
+
+def _encode(im, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == 'JPEG':
+        im.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        im.save(buf, 'WEBP', quality=quality, method=4)
+    return buf.getvalue()
+
+
+def normalize_original(img):
+    """Validate the uploaded original, bake in its EXIF orientation and strip metadata.
+
+    Raises ValueError when the file is not an image Pillow can decode. Only
+    an original carrying EXIF data is re-encoded (same format). The result
+    is stored as the blob of its own hash and `img.image` is pointed at it;
+    the uploaded blob is left untouched, since other rows (and other jobs)
+    may be reading it. Returns the replaced name, or None when nothing changed.
+    """
+    try:
+        with img.image.open('rb') as fh:
+            with Image.open(fh) as probe:
+                probe.verify()
+            # verify() leaves the image unusable; reopen to decode
+            fh.seek(0)
+            with Image.open(fh) as source:
+                fmt = source.format
+                has_exif = bool(source.getexif())
+                im = ImageOps.exif_transpose(source)
+                im.load()
+    except Exception as exc:
+        raise ValueError(f"not a readable image: {exc}") from exc
+
+    if not has_exif:
+        return None
+    buf = io.BytesIO()
+    save_kwargs = {'quality': 92} if fmt in ('JPEG', 'WEBP') else {}
+    if fmt == 'JPEG' and im.mode not in ('RGB', 'L', 'CMYK'):
+        im = im.convert('RGB')
+    # re-encoding without passing exif= drops the metadata (GPS position etc.)
+    im.save(buf, fmt, **save_kwargs)
+    data = buf.getvalue()
+    storage = img.image.storage
+    previous = img.image.name
+    name = blob_name(hashlib.sha256(data).hexdigest(), os.path.splitext(previous)[1].lower())
+    with blob_locks([name]):
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(data))
+        img.image.name = name
+        img.save(update_fields=['image'])
+    return previous
+
+
+def generate_renditions(img):
+    """Create the renditions of `img` and record the original's dimensions.
+
+    Existing renditions are replaced. Raises whatever Pillow raises for
+    unreadable files; callers decide whether that is fatal.
+    """
+    with img.image.open('rb') as fh:
+        with Image.open(fh) as source:
+            # apply the camera's orientation so width/height match what is displayed
+            im = ImageOps.exif_transpose(source)
+            im.load()
+    width, height = im.size
+    # JPEG has no alpha channel; flatten anything unusual to RGB
+    if im.mode not in ('RGB', 'L'):
+        im = im.convert('RGB')
+
+    base, _ = os.path.splitext(os.path.basename(img.image.name))
+    # renditions may be shared with rows holding the same photo; leave the old
+    # files to the cleanup job, which only removes unreferenced ones
+    previous = [getattr(img, name).name for name in RENDITION_FIELDS if getattr(img, name)]
+    for name, max_width in RENDITION_WIDTHS.items():
+        scaled = im.copy()
+        if scaled.width > max_width:
+            scaled.thumbnail((max_width, scaled.height), Image.LANCZOS)
+        getattr(img, name).save(f"{base}-{name}.jpg", ContentFile(_encode(scaled, 'JPEG', JPEG_QUALITY)), save=False)
+        getattr(img, f"{name}_webp").save(f"{base}-{name}.webp", ContentFile(_encode(scaled, 'WEBP', WEBP_QUALITY)), save=False)
+
+    img.width = width
+    img.height = height
+    img.save(update_fields=['width', 'height', *RENDITION_FIELDS])
+    if previous:
+        from .tasks import schedule_file_cleanup
+        schedule_file_cleanup(previous)
+
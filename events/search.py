@@ -0,0 +1,182 @@
+"""Full-text search over event title, description and location.
+
+The index lives in the database next to events_event and is maintained by
+the database itself, so every write path (forms, admin, bulk updates)
+keeps it in sync:
+
+- SQLite: an FTS5 table (events_event_fts) using events_event as external
+  content, updated by AFTER INSERT/UPDATE/DELETE triggers.
+- PostgreSQL: a generated `search_vector` tsvector column (title weighted
+  A, description B, location C) with a GIN index.
+
+Other backends fall back to icontains. `search_events` filters a queryset
+by a free-text query and can annotate a `search_rank` (higher is better).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Lookup, Q
+from django.db.models.expressions import RawSQL
+
+from .models import EventSearch, FullTextDocumentField
+
+FTS_TABLE = EventSearch._meta.db_table
+SEARCH_FIELDS = ('title', 'description', 'location')
+# tsvector weight per field (PostgreSQL)
+FIELD_WEIGHTS = {'title': 'A', 'description': 'B', 'location': 'C'}
+
+_SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, location,
+        content='events_event', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON events_event BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON events_event BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description, location ON events_event BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO {FTS_TABLE}(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+]
+
+_SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+_POSTGRES_INSTALL = [
+    """ALTER TABLE events_event ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(location, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS event_search_vector_idx ON events_event USING GIN (search_vector)",
+]
+
+_POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS event_search_vector_idx",
+    "ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _sqlite_triggers_missing(cursor):
+    cursor.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+        [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'],
+    )
+    return cursor.fetchone()[0] < 3
+
+
+def install_search_index(connection):
+    """Create the search index for `connection` if it is missing (idempotent).
+
+    On SQLite, rebuilding events_event (which Django does for some schema
+    changes) drops its triggers; when any are missing they are recreated
+    and the FTS table is rebuilt from the events table.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if not _sqlite_triggers_missing(cursor):
+                return
+            for sql in _SQLITE_INSTALL:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            for sql in _POSTGRES_INSTALL:
+                cursor.execute(sql)
+
+
+def uninstall_search_index(connection):
+    statements = {'sqlite': _SQLITE_UNINSTALL, 'postgresql': _POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_search_index(connection):
+    """Recreate the SQLite FTS contents from events_event (PostgreSQL needs nothing)."""
+    install_search_index(connection)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+@FullTextDocumentField.register_lookup
+class Match(Lookup):
+    """`search_entry__document__match=<FTS5 query>`."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+def query_terms(query):
+    """Split free text into lowercase word tokens (punctuation is dropped)."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def search_events(qs, query, fields=None, rank=False):
+    """Filter an Event queryset to rows matching every word of `query`.
+
+    Words match as prefixes. `fields` restricts the match to some of
+    SEARCH_FIELDS (e.g. ('title',)). With `rank=True` the rows get a
+    `search_rank` annotation, higher meaning more relevant.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return qs
+    fields = tuple(fields or SEARCH_FIELDS)
+    vendor = connections[qs.db].vendor
+    table = qs.model._meta.db_table
+
+    if vendor == 'sqlite':
+        # "word"* per term, implicitly ANDed; {col col} limits the columns
+        match = ' '.join(f'"{t}"*' for t in terms)
+        if set(fields) != set(SEARCH_FIELDS):
+            match = '{%s} : (%s)' % (' '.join(fields), match)
+        if rank:
+            # join the FTS table (see EventSearch) so the full-text query runs
+            # once and each row reads its `rank` (bm25, lower is better); a
+            # correlated subquery would rerun the match for every row
+            return qs.filter(search_entry__document__match=match).annotate(search_rank=-F('search_entry__rank'))
+        return qs.filter(RawSQL(
+            f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            (match,), output_field=BooleanField(),
+        ))
+
+    if vendor == 'postgresql':
+        weights = ''.join(FIELD_WEIGHTS[f] for f in fields)
+        if weights == 'ABC':
+            weights = ''
+        tsquery = ' & '.join(f'{t}:*{weights}' for t in terms)
+        qs = qs.filter(RawSQL(
+            f'"{table}"."search_vector" @@ to_tsquery(\'simple\', %s)',
+            (tsquery,), output_field=BooleanField(),
+        ))
+        if rank:
+            qs = qs.annotate(search_rank=RawSQL(
+                f'ts_rank("{table}"."search_vector", to_tsquery(\'simple\', %s))',
+                (tsquery,), output_field=FloatField(),
+            ))
+        return qs
+
+    # no full-text support: every term must appear in one of the fields
+    for t in terms:
+        q = Q()
+        for f in fields:
+            q |= Q(**{f'{f}__icontains': t})
+        qs = qs.filter(q)
+    return qs
@@ -0,0 +1,190 @@
+"""Signal handlers that keep derived data in step with events.
+
+Connected from `EventsConfig.ready()`.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .counters import M2M_COUNTERS, adjust
+from .feed_cache import bump, community_scopes, group_scopes, invalidate_event
+from .groups import rebuild_group_closure
+from .models import Community, CommunityGroup, Country, Event, EventImage, Profile
+from .reference import bump_reference_version, forget_profile_country, reference_data
+from .targeting import add_targeting, remove_community_targeting, remove_targeting, update_start_time
+
+
+@receiver(pre_save, sender=Event)
+def remember_previous_country(sender, instance, **kwargs):
+    # an event moved to another country must also leave the old country's feed;
+    # the old start_time tells whether the targeting rows need updating
+    instance._previous_country_id = None
+    instance._previous_start_time = None
+    if instance.pk:
+        previous = Event.objects.filter(pk=instance.pk).values_list('country_id', 'start_time').first()
+        if previous:
+            instance._previous_country_id, instance._previous_start_time = previous
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_country_id', None)
+    # a brand new event has no targeted communities yet; m2m_changed covers them
+    invalidate_event(instance, community_ids=[] if created else None, country_ids=(previous,))
+    if not created and getattr(instance, '_previous_start_time', None) != instance.start_time:
+        update_start_time(instance)
+
+
+@receiver(pre_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    # runs before the M2M rows are removed so their communities are still known
+    invalidate_event(instance)
+
+
+def _events_touched(instance, reverse, pk_set, action):
+    """Return the events affected by an m2m_changed signal on an Event relation."""
+    if not reverse:
+        return [instance]
+    if action == 'post_clear':
+        ids = getattr(instance, '_feed_cleared_event_ids', [])
+    else:
+        ids = pk_set or []
+    return list(Event.objects.filter(pk__in=ids))
+
+
+@receiver(m2m_changed, sender=Event.targeted_communities.through)
+def targeted_communities_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # remember what is about to go away; post_clear gets no pk_set
+        if reverse:
+            instance._feed_cleared_event_ids = list(instance.targeted_events.values_list('id', flat=True))
+        else:
+            instance._feed_cleared_community_ids = list(instance.targeted_communities.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        # only feeds filtered by the added/removed communities change
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_feed_cleared_community_ids', [])
+        bump(community_scopes(pk_set or []))
+        return
+
+    # community.targeted_events.add(...): the community's own feed changes
+    events = _events_touched(instance, reverse, pk_set, action)
+    if events:
+        bump(community_scopes([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Event.targeted_communities.through)
+def sync_targeting(sender, instance, action, reverse, pk_set, **kwargs):
+    # mirror the M2M rows into EventTargeting (see events.targeting)
+    if action == 'post_add':
+        if reverse:
+            add_targeting(pk_set, [instance.pk])
+        else:
+            add_targeting([instance.pk], pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            remove_community_targeting(instance.pk, pk_set)
+        else:
+            remove_targeting([instance.pk], pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            remove_community_targeting(instance.pk)
+        else:
+            remove_targeting([instance.pk])
+
+
+@receiver(m2m_changed, sender=Event.participants.through)
+@receiver(m2m_changed, sender=Event.attendees.through)
+def update_member_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # keep Event.participants_count / attendees_count in step (see events.counters)
+    field = M2M_COUNTERS[sender]
+    relation = Event.participants if sender is Event.participants.through else Event.attendees
+    event_col, user_col = relation.field.m2m_column_name(), relation.field.m2m_reverse_name()
+    removed_attr = f'_removed_for_{field}'
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every pk it was given, linked or not; count the rows that really go
+        rows = sender.objects.filter(**{user_col if reverse else event_col: instance.pk})
+        if action == 'pre_remove':
+            rows = rows.filter(**{f'{event_col if reverse else user_col}__in': pk_set})
+        setattr(instance, removed_attr, list(rows.values_list(event_col, flat=True)))
+    elif action == 'post_add':
+        # add() reports only the rows it actually inserted
+        if reverse:
+            adjust(pk_set, field, 1)
+        else:
+            adjust([instance.pk], field, len(pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop(removed_attr, [])
+        if reverse:
+            adjust(removed, field, -1)
+        else:
+            adjust([instance.pk], field, -len(removed))
+
+
+@receiver(post_save, sender=EventImage)
+def image_created(sender, instance, created, **kwargs):
+    # deletes adjust the counter where they happen (delete_selected_images,
+    # EventImageAdmin): a delete receiver would disable fast deletes
+    if created:
+        adjust([instance.event_id], 'images_count', 1)
+
+
+@receiver(m2m_changed, sender=Event.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            instance._feed_cleared_event_ids = list(instance.participating_events.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # participant counts are part of the shared feed body
+    for ev in _events_touched(instance, reverse, pk_set, action):
+        invalidate_event(ev)
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+def reference_data_changed(sender, **kwargs):
+    # dropdowns and group members are cached per process (events.reference)
+    bump_reference_version()
+    # regenerate the published communities file right away
+    transaction.on_commit(reference_data)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    # the calendar's default country is cached per user (events.reference)
+    forget_profile_country(instance.user_id)
+
+
+def _group_tree_changed():
+    bump_reference_version()
+    # membership of any group (and so of its ancestors) may have changed
+    bump(group_scopes(CommunityGroup.objects.values_list('slug', flat=True)))
+    transaction.on_commit(reference_data)
+
+
+@receiver(post_save, sender=CommunityGroup)
+@receiver(post_delete, sender=CommunityGroup)
+def community_group_changed(sender, **kwargs):
+    rebuild_group_closure()
+    _group_tree_changed()
+
+
+@receiver(m2m_changed, sender=CommunityGroup.communities.through)
+def community_group_members_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _group_tree_changed()
+
+
+@receiver(post_delete, sender=Community)
+def community_deleted(sender, **kwargs):
+    # its group memberships went with it, without an m2m_changed signal
+    _group_tree_changed()
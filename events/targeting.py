@@ -0,0 +1,73 @@
+"""Keeps EventTargeting in step with Event.targeted_communities.
+
+`events.signals` calls these from m2m_changed (membership) and post_save
+(an event's start_time is copied into its rows). `rebuild_targeting`
+recomputes the whole table, e.g. after raw SQL edits.
+"""
+from django.db import transaction
+
+from .models import Event, EventTargeting
+
+
+def add_targeting(event_ids, community_ids):
+    """Record that every event in `event_ids` targets every community in `community_ids`."""
+    starts = dict(Event.objects.filter(pk__in=event_ids).values_list('pk', 'start_time'))
+    EventTargeting.objects.bulk_create(
+        [EventTargeting(event_id=eid, community_id=cid, start_time=start)
+         for eid, start in starts.items() for cid in community_ids],
+        ignore_conflicts=True,
+    )
+
+
+def remove_targeting(event_ids, community_ids=None):
+    """Drop targeting rows of `event_ids` (only for `community_ids` when given)."""
+    qs = EventTargeting.objects.filter(event_id__in=event_ids)
+    if community_ids is not None:
+        qs = qs.filter(community_id__in=community_ids)
+    qs.delete()
+
+
+def remove_community_targeting(community_id, event_ids=None):
+    """Drop targeting rows of a community (only for `event_ids` when given)."""
+    qs = EventTargeting.objects.filter(community_id=community_id)
+    if event_ids is not None:
+        qs = qs.filter(event_id__in=event_ids)
+    qs.delete()
+
+
+def update_start_time(event):
+    EventTargeting.objects.filter(event_id=event.pk).exclude(start_time=event.start_time).update(
+        start_time=event.start_time,
+    )
+
+
+def targeted_event_ids(community_ids, starting_before=None):
+    """Subquery of ids of events targeting any of `community_ids`.
+
+    Used as `event_id__in=...`; with `starting_before` it is a range scan
+    on targeting_community_idx.
+    """
+    qs = EventTargeting.objects.filter(community_id__in=community_ids)
+    if starting_before is not None:
+        qs = qs.filter(start_time__lt=starting_before)
+    return qs.values('event_id')
+
+
+@transaction.atomic
+def rebuild_targeting(batch_size=1000):
+    """Recompute EventTargeting from the M2M table; returns the number of rows."""
+    through = Event.targeted_communities.through
+    EventTargeting.objects.all().delete()
+    rows = through.objects.values_list('event_id', 'community_id', 'event__start_time').order_by()
+    batch = []
+    total = 0
+    for event_id, community_id, start_time in rows.iterator(chunk_size=batch_size):
+        batch.append(EventTargeting(event_id=event_id, community_id=community_id, start_time=start_time))
+        if len(batch) >= batch_size:
+            EventTargeting.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        EventTargeting.objects.bulk_create(batch)
+        total += len(batch)
+    return total
@@ -0,0 +1,112 @@
+"""Background job handlers (see events.jobs)."""
+from django.core.files.storage import default_storage
+
+from .archives import archive_key, build_cached_archive, get_cached_archive
+from .jobs import PermanentJobError, enqueue_many, job_handler
+from .models import EventImage
+from .renditions import RENDITION_FIELDS, generate_renditions, normalize_original
+from .uploads import blob_locks
+
+
+@job_handler('process_image')
+def process_image(image_id):
+    """Finish an uploaded photo: validate it, fix orientation, strip EXIF, render."""
+    img = EventImage.objects.filter(pk=image_id).first()
+    if img is None:
+        # deleted before the worker got to it
+        return
+    uploaded = img.image.name
+    twin = None
+    if img.content_hash:
+        twin = (
+            EventImage.objects.filter(content_hash=img.content_hash, status='ready')
+            .exclude(pk=img.pk).exclude(thumbnail='').first()
+        )
+    if twin is not None:
+        # the same upload was already processed for another row; share its
+        # normalized original and renditions, unless they are being deleted
+        # with that row (the locks hold them until this row references them)
+        shared = [getattr(twin, field).name for field in ('image', *RENDITION_FIELDS) if getattr(twin, field)]
+        with blob_locks(shared):
+            if all(default_storage.exists(name) for name in shared):
+                for field in ('image', 'width', 'height', *RENDITION_FIELDS):
+                    setattr(img, field, getattr(twin, field))
+                img.status = 'ready'
+                img.save(update_fields=['image', 'width', 'height', 'status', *RENDITION_FIELDS])
+            else:
+                twin = None
+    if twin is None:
+        try:
+            normalize_original(img)
+        except ValueError as exc:
+            raise PermanentJobError(str(exc)) from exc
+        generate_renditions(img)
+        img.status = 'ready'
+        img.save(update_fields=['status'])
+    if img.image.name != uploaded:
+        # the uploaded blob goes once no other row still waits on it
+        schedule_file_cleanup([uploaded])
+
+
+def _image_failed(image_id):
+    EventImage.objects.filter(pk=image_id).update(status='failed')
+
+
+process_image.on_failure = _image_failed
+
+
+# storage paths removed per cleanup job
+CLEANUP_BATCH_SIZE = 100
+
+
+def schedule_file_cleanup(names):
+    """Queue deletion of the given storage paths, CLEANUP_BATCH_SIZE per job."""
+    names = list(names)
+    enqueue_many('delete_files', [
+        {"names": names[i:i + CLEANUP_BATCH_SIZE]} for i in range(0, len(names), CLEANUP_BATCH_SIZE)
+    ])
+
+
+def _referenced(names):
+    """The subset of storage paths still used by some EventImage row."""
+    used = set()
+    for field in ('image', *RENDITION_FIELDS):
+        used.update(EventImage.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return used
+
+
+@job_handler('delete_files')
+def delete_files(names):
+    """Remove files from storage unless a row still references them.
+
+    Blobs are shared between rows with the same content, so the reference
+    check runs here, at deletion time, under the blob locks that writers
+    take before reusing a blob (see events.uploads). Deleting an
+    already-missing file is a no-op, so a retried batch simply redoes the
+    ones that failed."""
+    failed = []
+    with blob_locks(names):
+        still_used = _referenced(names)
+        for name in names:
+            if name in still_used:
+                continue
+            try:
+                default_storage.delete(name)
+            except Exception as exc:
+                failed.append(f"{name}: {exc}")
+    if failed:
+        raise RuntimeError("could not delete " + "; ".join(failed))
+
+
+# reads a few rows, then spends minutes writing the ZIP: no transaction
+@job_handler('build_archive', atomic=False)
+def build_archive(event_id, image_ids, key):
+    """Build the cached ZIP for a set of gallery images, unless it exists or went stale."""
+    if get_cached_archive(event_id, key):
+        return
+    imgs = list(EventImage.objects.filter(event_id=event_id, id__in=image_ids).order_by('-created_at', '-id'))
+    if archive_key((img.id, img.content_hash, img.image.name) for img in imgs) != key:
+        # the gallery changed since the job was queued; a fresh request will queue a new one
+        return
+    build_cached_archive(event_id, key, imgs)
+
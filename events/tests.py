@@ -1,3 +1,910 @@
-from django.test import TestCase
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event
+
+
+def make_event(title='Event', start=None, **kwargs):
+    start = start or timezone.now() + timedelta(days=1)
+    kwargs.setdefault('end_time', start + timedelta(hours=2))
+    return Event.objects.create(title=title, start_time=start, **kwargs)
+
+
+class TemporaryMediaMixin:
+    """Store the files a test class writes in a fresh MEDIA_ROOT, removed afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
+
+
+class EventAdminSearchTests(TestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+
+    def test_changelist_search_is_ranked(self):
+        best = make_event('Park concert', description='concert in the park')
+        other = make_event('Concert', location='Hall')
+        make_event('Cleanup')
+        response = self.client.get(reverse('admin:events_event_changelist'), {'q': 'concert park'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [best])
+
+        response = self.client.get(reverse('admin:events_event_changelist'), {'q': 'concert'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.context['cl'].result_list), {best, other})
+
+    def test_changelist_punctuation_only_search(self):
+        make_event('Concert')
+        response = self.client.get(reverse('admin:events_event_changelist'), {'q': '!!'})
+        self.assertEqual(response.status_code, 200)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_across_rows_sharing_a_millisecond(self):
+        from .models import EventImage
+        from .pagination import decode_cursor, encode_cursor, keyset_page
+
+        ev = make_event()
+        base = timezone.now().replace(microsecond=123000)
+        # like one bulk_create drop: created_at values microseconds apart
+        imgs = EventImage.objects.bulk_create([
+            EventImage(event=ev, image=f'event_images/{i}.jpg') for i in range(6)
+        ])
+        for i, img in enumerate(imgs):
+            EventImage.objects.filter(pk=img.pk).update(created_at=base + timedelta(microseconds=i * 100))
+
+        seen = []
+        position = None
+        while True:
+            rows, position = keyset_page(EventImage.objects.filter(event=ev), ('created_at', 'id'), position, 2,
+                                         descending=True)
+            seen.extend(r.pk for r in rows)
+            if position is None:
+                break
+            # round-trip through the opaque cursor like the views do
+            position = decode_cursor(encode_cursor(position))
+        self.assertEqual(seen, [img.pk for img in reversed(imgs)])
+
+
+    def test_tampered_history_cursor_is_ignored(self):
+        from .pagination import encode_cursor
+
+        user = get_user_model().objects.create_user('member', password='pw')
+        past = make_event('Past', start=timezone.now() - timedelta(days=3))
+        past.participants.add(user)
+        self.client.force_login(user)
+        url = reverse('participated_events')
+        for cursor in (
+            encode_cursor({'filters': [1]}),
+            encode_cursor({'filters': {'name': ['x']}}),
+            encode_cursor({'after': 'x'}),
+            encode_cursor({'after': ['2024-13-45T00:00:00', 1]}),
+            encode_cursor({'after': [past.start_time.isoformat(), '1']}),
+            encode_cursor({'back': 'yes'}),
+            encode_cursor([1]),
+            'not-a-cursor',
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([e.pk for e in response.context['events']], [past.pk])
+                self.assertIsNone(response.context['previous_cursor'])
+
+
+class GalleryOriginalAccessTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        from django.core.files.base import ContentFile
+        from .models import EventImage
+
+        User = get_user_model()
+        self.uploader = User.objects.create_user('uploader', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.event = make_event()
+        self.ready = EventImage(event=self.event, uploaded_by=self.uploader, status='ready')
+        self.ready.image.save('ready.jpg', ContentFile(b'ready'), save=True)
+        self.pending = EventImage(event=self.event, uploaded_by=self.uploader, status='processing')
+        self.pending.image.save('pending.jpg', ContentFile(b'pending'), save=True)
+
+    def zip_names(self, response):
+        import io
+        import zipfile
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return {n.rsplit('/', 1)[-1] for n in zipfile.ZipFile(io.BytesIO(body)).namelist()}
+
+    def test_unprocessed_original_only_served_to_uploader(self):
+        url = self.pending.file_url('original')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.uploader)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.ready.file_url('original')).status_code, 200)
+
+    def test_gallery_json_hides_unprocessed_original(self):
+        url = reverse('event_gallery_images', args=[self.event.pk])
+        items = {i['id']: i for i in self.client.get(url).json()['items']}
+        self.assertIsNone(items[self.pending.pk]['url'])
+        self.assertEqual(items[self.ready.pk]['url'], self.ready.url)
+        self.client.force_login(self.uploader)
+        items = {i['id']: i for i in self.client.get(url).json()['items']}
+        self.assertEqual(items[self.pending.pk]['url'], self.pending.url)
+
+    def test_zip_leaves_out_unprocessed_images_of_others(self):
+        url = reverse('download_event_images', args=[self.event.pk])
+        self.client.force_login(self.other)
+        names = self.zip_names(self.client.post(url, {'all': '1'}))
+        self.assertEqual(names, {self.ready.filename})
+        self.client.force_login(self.uploader)
+        names = self.zip_names(self.client.post(url, {'all': '1'}))
+        self.assertEqual(names, {self.ready.filename, self.pending.filename})
+
+
+class ImageDeliveryTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        from django.core.files.base import ContentFile
+        from .models import EventImage
+
+        self.img = EventImage(event=make_event(), status='ready')
+        self.img.image.save('photo.jpg', ContentFile(b'original bytes'), save=False)
+        self.img.thumbnail.save('photo-thumbnail.jpg', ContentFile(b'thumb'), save=False)
+        self.img.save()
+
+    def test_python_delivery_streams_the_file(self):
+        response = self.client.get(self.img.file_url('original'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'original bytes')
+        self.assertEqual(response['Content-Disposition'], f'inline; filename="{self.img.filename}"')
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertNotIn('X-Sendfile', response)
+
+    def test_x_accel_redirect(self):
+        with override_settings(MEDIA_DELIVERY='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected/'):
+            response = self.client.get(self.img.file_url('thumbnail'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.img.thumbnail.name)
+
+    def test_x_sendfile(self):
+        with override_settings(MEDIA_DELIVERY='x-sendfile'):
+            response = self.client.get(self.img.file_url('original'))
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], self.img.image.path)
+
+    def test_only_renditions_are_publicly_cached(self):
+        from django.utils.cache import get_max_age
+        original = self.client.get(self.img.file_url('original'))
+        self.assertIn('private', original['Cache-Control'])
+        self.assertIn('no-cache', original['Cache-Control'])
+        thumbnail = self.client.get(self.img.file_url('thumbnail'))
+        self.assertIn('public', thumbnail['Cache-Control'])
+        self.assertEqual(get_max_age(thumbnail), 86400)
+
+
+class FeedCacheTests(TestCase):
+    def test_bump_waits_for_commit(self):
+        from .feed_cache import feed_cache_key
+
+        before = feed_cache_key(None, None, None, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_event()
+            # a request reading now still sees the old rows: keep the old key
+            self.assertEqual(feed_cache_key(None, None, None, None), before)
+        self.assertNotEqual(feed_cache_key(None, None, None, None), before)
+
+
+class ReferenceDataTests(TestCase):
+    def test_version_bump_waits_for_commit(self):
+        from .models import Country
+        from .reference import _current_version
+
+        before = _current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Country.objects.create(name='Romania')
+            self.assertEqual(_current_version(), before)
+        self.assertNotEqual(_current_version(), before)
+
+    def test_calendar_default_country_needs_no_profile_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import Country, Profile
+
+        user = get_user_model().objects.create_user('member', password='pw')
+        country = Country.objects.create(name='Romania')
+        profile = Profile.objects.create(user=user, country=country)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('calendar')).context['selected_country'], str(country.pk))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('calendar'))
+        self.assertFalse([q for q in queries if 'events_profile' in q['sql']])
+
+        other = Country.objects.create(name='Moldova')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.country = other
+            profile.save()
+        self.assertEqual(self.client.get(reverse('calendar')).context['selected_country'], str(other.pk))
+
+
+    def test_event_forms_render_countries_from_reference_data(self):
+        from .models import Country
+
+        user = get_user_model().objects.create_user('member', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            country = Country.objects.create(name='Romania')
+        event = make_event(owner=user, country=country)
+        self.client.force_login(user)
+        for url in (reverse('myevents'), reverse('event_edit', args=[event.pk])):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, f'<option value="{country.pk}"', html=False)
+                self.assertFalse([q for q in queries if 'events_country' in q['sql']])
+
+
+class CommunityGroupTests(TestCase):
+    def setUp(self):
+        from .models import Community, CommunityGroup
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sector = Community.objects.create(name='Sector 1')
+            self.elsewhere = Community.objects.create(name='Cluj')
+            self.city = CommunityGroup.objects.create(name='Bucharest', slug='bucharest')
+            self.sectors = CommunityGroup.objects.create(name='Sectors', slug='sectors', parent=self.city)
+            self.sectors.communities.add(self.sector)
+
+    def closure(self):
+        from .models import CommunityGroupClosure
+        return set(CommunityGroupClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_closure_follows_parent_changes(self):
+        city, sectors = self.city.pk, self.sectors.pk
+        self.assertEqual(self.closure(), {(city, city, 0), (sectors, sectors, 0), (city, sectors, 1)})
+        self.sectors.parent = None
+        self.sectors.save()
+        self.assertEqual(self.closure(), {(city, city, 0), (sectors, sectors, 0)})
+
+    def test_feed_filters_by_group_slug(self):
+        from .occurrences import sync_event_occurrences
+
+        start = timezone.now() + timedelta(days=1)
+        inside = make_event('Inside', start=start)
+        inside.targeted_communities.add(self.sector)
+        outside = make_event('Outside', start=start)
+        outside.targeted_communities.add(self.elsewhere)
+        for ev in (inside, outside):
+            sync_event_occurrences(ev)
+        window = {'start': start.date().isoformat(), 'end': (start + timedelta(days=2)).date().isoformat()}
+        for slug in ('bucharest', 'sectors'):
+            with self.subTest(slug=slug):
+                entries = self.client.get(reverse('events_json'), dict(window, community=slug)).json()
+                self.assertEqual({e['title'] for e in entries}, {'Inside'})
+
+
+class TargetingSyncTests(TestCase):
+    def setUp(self):
+        from .models import Community
+
+        self.communities = [Community.objects.create(name=f'Community {i}') for i in range(3)]
+        self.event = make_event()
+
+    def rows(self):
+        from .models import EventTargeting
+        return set(EventTargeting.objects.values_list('event_id', 'community_id', 'start_time'))
+
+    def test_follows_m2m_changes(self):
+        a, b, c = self.communities
+        ev = self.event
+        ev.targeted_communities.add(a, b)
+        self.assertEqual(self.rows(), {(ev.pk, a.pk, ev.start_time), (ev.pk, b.pk, ev.start_time)})
+        ev.targeted_communities.remove(a)
+        c.targeted_events.add(ev)
+        self.assertEqual(self.rows(), {(ev.pk, b.pk, ev.start_time), (ev.pk, c.pk, ev.start_time)})
+        c.targeted_events.clear()
+        self.assertEqual(self.rows(), {(ev.pk, b.pk, ev.start_time)})
+        ev.targeted_communities.clear()
+        self.assertEqual(self.rows(), set())
+
+    def test_follows_start_time_on_save(self):
+        ev = self.event
+        ev.targeted_communities.add(self.communities[0])
+        ev.start_time += timedelta(days=3)
+        ev.end_time += timedelta(days=3)
+        ev.save()
+        self.assertEqual(self.rows(), {(ev.pk, self.communities[0].pk, ev.start_time)})
+
+    def test_rebuild_matches_the_m2m_table(self):
+        from .models import EventTargeting
+        from .targeting import rebuild_targeting
+
+        self.event.targeted_communities.add(*self.communities[:2])
+        expected = self.rows()
+        EventTargeting.objects.all().delete()
+        self.assertEqual(rebuild_targeting(), 2)
+        self.assertEqual(self.rows(), expected)
+
+
+class EventsJsonQueryTests(TestCase):
+    # session, user, occurrence and tail stamps, the user's participations, occurrences, open-series tail
+    FEED_QUERIES = 7
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('member', password='pw')
+        self.client.force_login(self.user)
+        self.start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def add_events(self, count):
+        from .models import EventType
+        from .occurrences import sync_event_occurrences
+
+        kind = EventType.objects.create(name=f'Type {EventType.objects.count()}')
+        for i in range(count):
+            # multi-day, so each event expands to several feed entries
+            ev = make_event(f'Event {i}', start=self.start + timedelta(hours=i), event_type=kind,
+                            end_time=self.start + timedelta(days=2, hours=i))
+            ev.participants.add(self.user)
+            sync_event_occurrences(ev)
+
+    def fetch(self):
+        window = {'start': self.start.date().isoformat(), 'end': (self.start + timedelta(days=7)).date().isoformat()}
+        return self.client.get(reverse('events_json'), window).json()
+
+    def test_query_count_does_not_grow_with_events(self):
+        from django.core.cache import cache
+
+        for count in (5, 40):
+            self.add_events(count)
+            cache.clear()
+            with self.assertNumQueries(self.FEED_QUERIES):
+                entries = self.fetch()
+            self.assertTrue(entries)
+            self.assertTrue(all(e['joined'] and e['type'] for e in entries))
+
+    def test_cached_body_skips_event_queries(self):
+        self.add_events(10)
+        self.fetch()
+        with self.assertNumQueries(self.FEED_QUERIES - 2):
+            self.fetch()
+
+    def test_window_clips_multi_day_events(self):
+        from datetime import timezone as dt_timezone
+        from .occurrences import sync_event_occurrences
+
+        # five days, of which the window shows the middle three
+        sync_event_occurrences(make_event('Long', start=self.start, end_time=self.start + timedelta(days=4)))
+        sync_event_occurrences(make_event('Later', start=self.start + timedelta(days=10)))
+        # feed days are UTC dates, so give the window in UTC too
+        first = self.start.astimezone(dt_timezone.utc).date() + timedelta(days=1)
+        window = {'start': f'{first.isoformat()}T00:00:00+00:00',
+                  'end': f'{(first + timedelta(days=3)).isoformat()}T00:00:00+00:00'}
+        entries = self.client.get(reverse('events_json'), window).json()
+        self.assertEqual([(e['title'], e['start'][:10]) for e in entries],
+                         [('Long', (first + timedelta(days=d)).isoformat()) for d in range(3)])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_etag_changes_without_a_shared_cache(self):
+        window = {'start': self.start.date().isoformat(), 'end': (self.start + timedelta(days=7)).date().isoformat()}
+        etag = self.client.get(reverse('events_json'), window)['ETag']
+        self.assertEqual(self.client.get(reverse('events_json'), window, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        from .occurrences import sync_event_occurrences
+        sync_event_occurrences(make_event('New', start=self.start))
+        response = self.client.get(reverse('events_json'), window, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['title'] for e in response.json()], ['New'])
+
+    def test_compact_feed_expands_to_the_full_feed_across_dst(self):
+        from datetime import date, datetime
+        from .occurrences import sync_event_occurrences
+
+        # weekly at 19:00 Bucharest over next year's end of summer time
+        year = timezone.now().year + 1
+        start = timezone.make_aware(datetime(year, 10, 12, 19))
+        ev = make_event('Weekly', start=start, recurrence_pattern='weekly', recurrence_interval=1,
+                        recurrence_end_date=date(year, 11, 10))
+        sync_event_occurrences(ev)
+        window = {'start': f'{year}-10-01', 'end': f'{year}-11-15'}
+        full = self.client.get(reverse('events_json'), window).json()
+        feed = self.client.get(reverse('events_json'), dict(window, format='compact')).json()
+
+        expanded = [
+            {'orig_id': feed['events']['id'][i], 'start': f"{day}T{feed['times'][t][0]}", 'end': f"{day}T{feed['times'][t][1]}"}
+            for i, day, t in feed['occurrences']
+        ]
+        self.assertEqual(expanded, [{k: e[k] for k in ('orig_id', 'start', 'end')} for e in full])
+        self.assertEqual(len({e['start'][11:] for e in full}), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class HotQueryPlanTests(TestCase):
+    """The listing and feed queries must be answered from indexes, never a full scan."""
+
+    def setUp(self):
+        from .models import Community, Country
+
+        self.user = get_user_model().objects.create_user('member', password='pw')
+        self.client.force_login(self.user)
+        self.country = Country.objects.create(name='Romania')
+        self.community = Community.objects.create(name='Cluj', country=self.country)
+        past = make_event('Past', start=timezone.now() - timedelta(days=3), owner=self.user, country=self.country)
+        past.participants.add(self.user)
+        upcoming = make_event('Upcoming', owner=self.user, country=self.country)
+        upcoming.participants.add(self.user)
+        upcoming.targeted_communities.add(self.community)
+
+    def full_scans(self, sql):
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            # "SCAN t" reads all of table t (or of one of its indexes); "SEARCH t USING ..."
+            # is a lookup. Scans of derived tables (a LIMITed subquery) are bounded.
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [step for step in plan if (re.match(r'SCAN (\w+)', step) or [None, None])[1] in tables]
+
+    def test_hot_queries_use_indexes(self):
+        day = timezone.now().date()
+        window = {'start': day.isoformat(), 'end': (day + timedelta(days=30)).isoformat()}
+        pages = [
+            (reverse('myevents'), {}),
+            (reverse('participated_events'), {'count': '1'}),
+            (reverse('organized_events'), {'count': '1'}),
+            (reverse('events_json'), window),
+            (reverse('events_json'), dict(window, country=self.country.pk)),
+            (reverse('events_json'), dict(window, community=self.community.pk)),
+        ]
+        for url, params in pages:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+            hot = [q['sql'] for q in queries
+                   if re.search(r'FROM "events_event(occurrence)?"', q['sql']) and q['sql'].startswith('SELECT')]
+            self.assertTrue(hot, url)
+            for sql in hot:
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertEqual(self.full_scans(sql), [])
+
+
+class ImageCounterTests(TestCase):
+    def setUp(self):
+        from .models import EventImage
+
+        self.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.event = make_event(owner=self.user)
+        self.images = [EventImage.objects.create(event=self.event, image=f'event_images/{i}.jpg') for i in range(3)]
+
+    def images_count(self):
+        return Event.objects.values_list('images_count', flat=True).get(pk=self.event.pk)
+
+    def test_gallery_delete_is_a_fast_delete(self):
+        from django.db.models.deletion import Collector
+        from .models import EventImage
+
+        self.assertEqual(self.images_count(), 3)
+        self.assertTrue(Collector('default').can_fast_delete(EventImage.objects.all()))
+        self.client.post(reverse('delete_event_images', args=[self.event.pk]),
+                         {'selected_images': [self.images[0].pk, self.images[1].pk]})
+        self.assertEqual(self.images_count(), 1)
+
+    def test_admin_delete_adjusts_counter(self):
+        url = reverse('admin:events_eventimage_changelist')
+        self.client.post(url, {'action': 'delete_selected', '_selected_action': [self.images[0].pk], 'post': 'yes'})
+        self.assertEqual(self.images_count(), 2)
+        self.client.post(reverse('admin:events_eventimage_delete', args=[self.images[1].pk]), {'post': 'yes'})
+        self.assertEqual(self.images_count(), 1)
+
+
+class GalleryDeleteTests(TestCase):
+    def setUp(self):
+        from .models import EventImage
+
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.uploader = User.objects.create_user('uploader', password='pw')
+        self.event = make_event(owner=self.owner)
+        self.mine = EventImage.objects.create(event=self.event, uploaded_by=self.uploader, image='event_images/mine.jpg',
+                                              thumbnail='event_images/renditions/mine.jpg')
+        self.theirs = EventImage.objects.create(event=self.event, uploaded_by=self.owner, image='event_images/theirs.jpg')
+        self.url = reverse('delete_event_images', args=[self.event.pk])
+
+    def delete(self, *images):
+        response = self.client.post(self.url, {'selected_images': [img.pk for img in images]},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return response.json()['deleted']
+
+    def test_uploader_deletes_only_own_images_and_files_are_queued(self):
+        from .models import BackgroundJob, EventImage
+
+        self.client.force_login(self.uploader)
+        self.assertEqual(self.delete(self.mine, self.theirs), [str(self.mine.pk)])
+        self.assertEqual(list(EventImage.objects.values_list('pk', flat=True)), [self.theirs.pk])
+        jobs = BackgroundJob.objects.filter(kind='delete_files')
+        self.assertEqual([sorted(job.payload['names']) for job in jobs],
+                         [['event_images/mine.jpg', 'event_images/renditions/mine.jpg']])
+
+    def test_event_owner_deletes_any_image(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(sorted(self.delete(self.mine, self.theirs)), sorted([str(self.mine.pk), str(self.theirs.pk)]))
+        self.assertEqual(Event.objects.get(pk=self.event.pk).images_count, 0)
+
+    def test_cleanup_batches(self):
+        from unittest import mock
+        from .models import BackgroundJob
+        from .tasks import schedule_file_cleanup
+
+        with mock.patch('events.tasks.CLEANUP_BATCH_SIZE', 2):
+            schedule_file_cleanup([f'event_images/{i}.jpg' for i in range(5)])
+        self.assertEqual([len(job.payload['names']) for job in BackgroundJob.objects.order_by('id')], [2, 2, 1])
+
+
+class MemberCounterTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [User.objects.create_user(f'user{i}', password='pw') for i in range(3)]
+        self.event = make_event()
+
+    def counts(self):
+        return Event.objects.values_list('participants_count', 'attendees_count').get(pk=self.event.pk)
+
+    def test_add_remove_clear(self):
+        self.event.participants.add(*self.users)
+        self.event.attendees.add(self.users[0])
+        self.assertEqual(self.counts(), (3, 1))
+        # adding again inserts nothing, removing a non-member deletes nothing
+        self.event.participants.add(self.users[0])
+        self.event.attendees.remove(self.users[1])
+        self.assertEqual(self.counts(), (3, 1))
+        self.event.participants.remove(self.users[0])
+        self.assertEqual(self.counts(), (2, 1))
+        self.event.participants.clear()
+        self.event.attendees.clear()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reverse_side(self):
+        other = make_event('Other')
+        user = self.users[0]
+        user.participating_events.add(self.event, other)
+        other.participants.add(self.users[1])
+        self.assertEqual(Event.objects.get(pk=other.pk).participants_count, 2)
+        user.participating_events.remove(other)
+        self.assertEqual(Event.objects.get(pk=other.pk).participants_count, 1)
+        user.participating_events.clear()
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(Event.objects.get(pk=other.pk).participants_count, 1)
+class ImageBlobTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.event = make_event()
+
+    def upload(self, data, name='photo.jpg'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import EventImage
+        from .uploads import store_uploads
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = store_uploads(self.event, [SimpleUploadedFile(name, data, content_type='image/jpeg')], None)
+        return EventImage.objects.get(pk=report[0]['id'])
+
+    def exif_jpeg(self):
+        import io
+        from PIL import Image
+
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90 degrees
+        buf = io.BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buf, 'JPEG', exif=exif)
+        return buf.getvalue()
+
+    def run_process_image(self, img):
+        from .tasks import process_image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_image(image_id=img.pk)
+        img.refresh_from_db()
+        return img
+
+    def test_concurrent_upload_of_the_same_photo_is_a_duplicate(self):
+        import hashlib
+        import io
+        from PIL import Image
+        from contextlib import contextmanager
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import EventImage
+        from .uploads import blob_locks, store_uploads
+
+        data = self.exif_jpeg()
+        png = io.BytesIO()
+        Image.new('RGB', (8, 8), 'blue').save(png, 'PNG')
+
+        @contextmanager
+        def racing_locks(names):
+            # another request stores the same photo after our gallery check
+            EventImage.objects.create(event=self.event, image='event_images/other.jpg',
+                                      content_hash=hashlib.sha256(data).hexdigest())
+            with blob_locks(names):
+                yield
+
+        with mock.patch('events.uploads.blob_locks', racing_locks):
+            report = store_uploads(self.event, [
+                SimpleUploadedFile('photo.jpg', data, content_type='image/jpeg'),
+                SimpleUploadedFile('new.png', png.getvalue(), content_type='image/png'),
+            ], None)
+        self.assertEqual(report[0], {'name': 'photo.jpg', 'ok': False, 'error': 'Already in this gallery.', 'duplicate': True})
+        # the rest of the drop still goes in
+        self.assertTrue(report[1]['ok'])
+        self.assertEqual(EventImage.objects.filter(event=self.event).count(), 2)
+
+    def test_normalized_original_goes_to_a_new_blob(self):
+        import hashlib
+        from django.core.files.storage import default_storage
+        from .models import BackgroundJob
+
+        data = self.exif_jpeg()
+        img = self.upload(data)
+        uploaded = img.image.name
+        img = self.run_process_image(img)
+
+        self.assertEqual(img.status, 'ready')
+        self.assertNotEqual(img.image.name, uploaded)
+        with img.image.open('rb') as fh:
+            normalized = fh.read()
+        # both blobs still match the hash in their name
+        self.assertIn(hashlib.sha256(normalized).hexdigest(), img.image.name)
+        with default_storage.open(uploaded, 'rb') as fh:
+            self.assertEqual(fh.read(), data)
+        # duplicates are still recognised by the uploaded bytes
+        self.assertEqual(img.content_hash, hashlib.sha256(data).hexdigest())
+        self.assertTrue(BackgroundJob.objects.filter(kind='delete_files', payload__names=[uploaded]).exists())
+
+    def test_same_upload_shares_the_normalized_blob(self):
+        from .tasks import delete_files
+
+        first = self.run_process_image(self.upload(self.exif_jpeg()))
+        self.event = make_event('Other')
+        second = self.upload(self.exif_jpeg())
+        uploaded = second.image.name
+        second = self.run_process_image(second)
+
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.thumbnail.name, first.thumbnail.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_files(names=[uploaded, first.image.name])
+        storage = first.image.storage
+        self.assertFalse(storage.exists(uploaded))
+        self.assertTrue(storage.exists(first.image.name))
+
+
+class BlobLockTests(TemporaryMediaMixin, TransactionTestCase):
+    def test_delete_waits_for_a_writer_reusing_the_blob(self):
+        import threading
+        import time
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.db import connections
+        from .models import EventImage
+        from .tasks import delete_files
+        from .uploads import blob_locks
+
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a second connection to a shared test database')
+        event = make_event()
+        # an orphaned blob, queued for deletion, that a new upload is about to reuse
+        name = default_storage.save('event_images/blobs/ab/cd/reused.jpg', ContentFile(b'x'))
+        locked = threading.Event()
+
+        def writer():
+            try:
+                with blob_locks([name]):
+                    self.assertTrue(default_storage.exists(name))
+                    locked.set()
+                    # the cleanup job runs its reference check now, before our row exists
+                    time.sleep(0.5)
+                    EventImage.objects.create(event=event, image=name)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.assertTrue(locked.wait(5))
+        delete_files(names=[name])
+        thread.join()
+        self.assertTrue(default_storage.exists(name))
+        default_storage.delete(name)
+
+
+class ArchiveJobTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        from django.core.files.base import ContentFile
+        from .models import EventImage
+
+        self.user = get_user_model().objects.create_user('member', password='pw')
+        self.client.force_login(self.user)
+        self.event = make_event()
+        self.img = EventImage(event=self.event, status='ready')
+        self.img.image.save('photo.jpg', ContentFile(b'bytes'), save=True)
+        self.url = reverse('download_event_images', args=[self.event.pk])
+
+    def archive_jobs(self):
+        from .models import BackgroundJob
+        return BackgroundJob.objects.filter(kind='build_archive').count()
+
+    def test_only_whole_gallery_downloads_are_cached(self):
+        b''.join(self.client.post(self.url, {'selected_images': [self.img.pk]}).streaming_content)
+        self.assertEqual(self.archive_jobs(), 0)
+        b''.join(self.client.post(self.url, {'all': '1'}).streaming_content)
+        self.assertEqual(self.archive_jobs(), 1)
+
+    def test_build_archive_runs_outside_a_transaction(self):
+        from unittest import mock
+        from .jobs import enqueue, run_job
+
+        archive = enqueue('build_archive', event_id=self.event.pk, image_ids=[self.img.pk], key='stale')
+        cleanup = enqueue('delete_files', names=[])
+        with mock.patch('events.jobs.transaction') as jobs_transaction:
+            self.assertEqual(run_job(archive.pk), 'done')
+            self.assertFalse(jobs_transaction.atomic.called)
+            self.assertEqual(run_job(cleanup.pk), 'done')
+            self.assertTrue(jobs_transaction.atomic.called)
+
+
+class ArchiveStreamTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.event = make_event()
+
+    def add_image(self, name, data, event=None):
+        from django.core.files.base import ContentFile
+        from .models import EventImage
+
+        img = EventImage(event=event or self.event, status='ready')
+        img.image.save(name, ContentFile(data), save=True)
+        return img
+
+    def read_zip(self, chunks):
+        import io
+        import zipfile
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        return archive
+
+    def test_compressed_formats_are_stored(self):
+        import zipfile
+        from .archives import stream_zip
+
+        images = [self.add_image('photo.jpg', b'jpeg bytes' * 100), self.add_image('scan.png', b'png bytes' * 100),
+                  self.add_image('raw.bmp', b'bmp bytes' * 100)]
+        archive = self.read_zip(stream_zip(images, chunk_size=64))
+        types = {info.filename.rsplit('.', 1)[1]: info.compress_type for info in archive.infolist()}
+        self.assertEqual(types, {'jpg': zipfile.ZIP_STORED, 'png': zipfile.ZIP_STORED, 'bmp': zipfile.ZIP_DEFLATED})
+        for img in images:
+            with img.image.open('rb') as fh:
+                self.assertEqual(archive.read(img.filename), fh.read())
+
+    def test_missing_files_are_skipped(self):
+        from .archives import stream_zip
+
+        kept = self.add_image('kept.jpg', b'kept')
+        gone = self.add_image('gone.jpg', b'gone')
+        gone.image.storage.delete(gone.image.name)
+        archive = self.read_zip(stream_zip([gone, kept]))
+        self.assertEqual(archive.namelist(), [kept.filename])
+
+    def test_download_selected_images(self):
+        user = get_user_model().objects.create_user('member', password='pw')
+        self.client.force_login(user)
+        first = self.add_image('first.jpg', b'first')
+        self.add_image('second.jpg', b'second')
+        elsewhere = self.add_image('elsewhere.jpg', b'elsewhere', event=make_event('Other'))
+
+        response = self.client.post(reverse('download_event_images', args=[self.event.pk]),
+                                    {'selected_images': [first.pk, elsewhere.pk]})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="event-images.zip"')
+        archive = self.read_zip(response.streaming_content)
+        self.assertEqual(archive.namelist(), [first.filename])
+        self.assertEqual(archive.read(first.filename), b'first')
+
+
+class WorkerTests(TransactionTestCase):
+    def test_run_worker_runs_a_queued_job(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .jobs import enqueue
+
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('pool processes cannot see an in-memory test database')
+        job = enqueue('delete_files', names=[])
+        out = StringIO()
+        call_command('run_worker', once=True, processes=1, stdout=out)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertIn(f'job {job.pk}: done', out.getvalue())
+
+    def test_jobs_of_a_dead_worker_are_released(self):
+        from .jobs import MAX_ATTEMPTS, claim_jobs, enqueue, release_jobs
+
+        retried = enqueue('delete_files', names=[])
+        exhausted = enqueue('delete_files', names=[])
+        self.assertEqual(sorted(claim_jobs(2)), [retried.pk, exhausted.pk])
+        type(exhausted).objects.filter(pk=exhausted.pk).update(attempts=MAX_ATTEMPTS)
+        statuses = release_jobs([retried.pk, exhausted.pk], 'worker died')
+        self.assertEqual(statuses, {retried.pk: 'queued', exhausted.pk: 'failed'})
+        retried.refresh_from_db()
+        self.assertEqual((retried.attempts, retried.last_error), (1, 'worker died'))
+        self.assertIsNone(retried.locked_at)
+
+
+class RecurrenceTests(SimpleTestCase):
+    tz = 'Europe/Bucharest'
+
+    def series(self, pattern, start, interval=1, hours=2, end_date=None):
+        from datetime import datetime, timezone as dt_timezone
+        local = timezone.make_aware(datetime.fromisoformat(start))
+        # the database hands datetimes back in UTC
+        start_time = local.astimezone(dt_timezone.utc)
+        return Event(start_time=start_time, end_time=start_time + timedelta(hours=hours),
+                     recurrence_pattern=pattern, recurrence_interval=interval, recurrence_end_date=end_date)
+
+    def local_starts(self, ev, window_start=None, window_end=None, count=None):
+        from itertools import islice
+        from .recurrence import iter_occurrences
+        return [timezone.localtime(s).strftime('%Y-%m-%d %H:%M')
+                for s, _ in islice(iter_occurrences(ev, window_start, window_end), count)]
+
+    def test_local_time_kept_across_dst(self):
+        with timezone.override(self.tz):
+            # clocks go forward on 2026-03-29 and back on 2026-10-25
+            weekly = self.series('weekly', '2026-03-19 19:00')
+            self.assertEqual(self.local_starts(weekly, count=3),
+                             ['2026-03-19 19:00', '2026-03-26 19:00', '2026-04-02 19:00'])
+            daily = self.series('daily', '2026-10-24 09:30')
+            self.assertEqual(self.local_starts(daily, count=3),
+                             ['2026-10-24 09:30', '2026-10-25 09:30', '2026-10-26 09:30'])
+            monthly = self.series('monthly', '2026-09-30 18:00')
+            self.assertEqual(self.local_starts(monthly, count=3),
+                             ['2026-09-30 18:00', '2026-10-30 18:00', '2026-11-30 18:00'])
+
+    def test_occurrences_stay_in_the_start_time_zone(self):
+        from datetime import timezone as dt_timezone
+        from itertools import islice
+        from .recurrence import iter_occurrences
+        with timezone.override(self.tz):
+            ev = self.series('weekly', '2026-03-19 19:00')
+            for occ_start, occ_end in islice(iter_occurrences(ev), 3):
+                self.assertIs(occ_start.tzinfo, dt_timezone.utc)
+
+    def test_window_jump_matches_full_expansion(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .recurrence import iter_occurrences
+        with timezone.override(self.tz):
+            cases = [
+                self.series('daily', '2020-01-15 23:30', hours=3),
+                self.series('weekly', '2021-06-01 00:30', interval=2, hours=1),
+                self.series('monthly', '2019-01-31 12:00', hours=50),
+                self.series('monthly', '2022-03-29 03:30', interval=5),
+            ]
+            windows = [datetime(2026, m, d, h, tzinfo=dt_timezone.utc)
+                       for m, d in ((3, 28), (3, 29), (10, 24), (10, 25), (12, 31)) for h in (0, 1, 22, 23)]
+            for ev in cases:
+                for window_start in windows:
+                    window_end = window_start + timedelta(days=70)
+                    # brute force: walk the whole series from its first occurrence
+                    expected = [occ for occ in iter_occurrences(ev, None, window_end) if occ[1] > window_start]
+                    with self.subTest(pattern=ev.recurrence_pattern, start=ev.start_time, window=window_start):
+                        self.assertEqual(list(iter_occurrences(ev, window_start, window_end)), expected)
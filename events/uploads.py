@@ -0,0 +1,185 @@
+"""Batched, deduplicating handling of multi-file photo uploads.
+
+A gallery drop can carry dozens of photos. `store_uploads` inspects them
+concurrently (header check plus a SHA-256 of the bytes computed while
+reading them in chunks), writes the new ones to storage in parallel and
+inserts all EventImage rows (plus their processing jobs) with one
+bulk_create each, returning a per-file report for the upload UI.
+
+Files are stored content-addressed under BLOB_ROOT by their hash, so the
+same photo uploaded to several events is kept once on disk; a photo that
+is already in the event's gallery is skipped (a unique constraint on
+(event, content_hash) catches concurrent uploads). A stored blob is never
+rewritten, and `blob_locks` keeps writers from reusing a blob that the
+cleanup job (events.tasks.delete_files) is about to remove.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from PIL import Image
+
+from .counters import adjust
+from .jobs import enqueue_many
+from .models import BlobLock, EventImage
+
+# threads used for inspecting and writing files
+UPLOAD_WORKERS = 4
+
+BLOB_ROOT = 'event_images/blobs'
+
+# canonical extension per Pillow format, so identical bytes map to one path
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+    'HEIF': '.heic',
+    'AVIF': '.avif',
+}
+
+
+def blob_name(digest, ext):
+    """Storage path of the blob with the given SHA-256 hex digest."""
+    return f"{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+@contextmanager
+def blob_locks(names):
+    """Hold the lock of every storage path in `names` until the transaction ends.
+
+    Writers hold it from the existence check until the row referencing the
+    file is saved; delete_files holds it from the reference check until the
+    file is gone. A lock is a BlobLock row locked with SELECT ... FOR UPDATE,
+    taken in sorted order so two holders of overlapping sets cannot
+    deadlock, and released when the outermost transaction commits or rolls
+    back. On SQLite, which ignores FOR UPDATE, the INSERT already holds the
+    database write lock.
+    """
+    names = sorted(set(names))
+    with transaction.atomic():
+        if names:
+            BlobLock.objects.bulk_create([BlobLock(name=name) for name in names], ignore_conflicts=True)
+            list(BlobLock.objects.select_for_update().filter(name__in=names).order_by('name').values_list('name'))
+        yield
+
+
+def file_digest(f):
+    """SHA-256 hex digest of a Django File, read in chunks."""
+    h = hashlib.sha256()
+    f.seek(0)
+    for chunk in f.chunks():
+        h.update(chunk)
+    f.seek(0)
+    return h.hexdigest()
+
+
+def _inspect(f):
+    """Return (error, blob path) for an uploaded file.
+
+    Only the image header is parsed here; the full decode happens in the worker.
+    """
+    try:
+        f.seek(0)
+        with Image.open(f) as im:
+            fmt = im.format
+    except Exception:
+        fmt = None
+    if not fmt:
+        return 'Not a supported image file.', None
+    _, ext = os.path.splitext(getattr(f, 'name', '') or '')
+    ext = FORMAT_EXTENSIONS.get(fmt, ext.lower() or '.jpg')
+    return None, blob_name(file_digest(f), ext)
+
+
+def _store(f, name):
+    """Write `f` to `name` unless that blob already exists; returns (stored name, error)."""
+    storage = EventImage._meta.get_field('image').storage
+    try:
+        if storage.exists(name):
+            return name, None
+        return storage.save(name, f), None
+    except Exception as exc:
+        return None, f'Could not store file: {exc}'
+
+
+def store_uploads(event, files, user):
+    """Validate, store and record `files` for `event`.
+
+    Returns a list of per-file dicts ({"name", "ok", "id" or "error"}) in
+    the order the files were given.
+    """
+    report = [{"name": getattr(f, 'name', '') or '', "ok": False} for f in files]
+    if not files:
+        return report
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        inspected = list(pool.map(_inspect, files))
+
+        digests = {os.path.splitext(os.path.basename(name))[0] for err, name in inspected if err is None}
+        in_gallery = set(
+            EventImage.objects.filter(event=event, content_hash__in=digests).values_list('content_hash', flat=True)
+        )
+        to_store = []
+        for i, (err, name) in enumerate(inspected):
+            if err is not None:
+                report[i]["error"] = err
+                continue
+            digest = os.path.splitext(os.path.basename(name))[0]
+            if digest in in_gallery:
+                report[i].update(error='Already in this gallery.', duplicate=True)
+                continue
+            # also catches the same photo twice in one drop
+            in_gallery.add(digest)
+            to_store.append((i, name, digest))
+
+        # an existing blob may be queued for deletion; hold it until our rows reference it
+        with blob_locks(name for _, name, _ in to_store):
+            stored = list(pool.map(lambda item: _store(files[item[0]], item[1]), to_store))
+
+            rows = []
+            indexes = []
+            for (i, _, digest), (name, err) in zip(to_store, stored):
+                if err is not None:
+                    report[i]["error"] = err
+                    continue
+                rows.append(EventImage(event=event, image=name, uploaded_by=user, status='processing', content_hash=digest))
+                indexes.append(i)
+            created = _insert(rows) if rows else []
+
+    for i, img in zip(indexes, created):
+        if img is None:
+            report[i].update(error='Already in this gallery.', duplicate=True)
+        else:
+            report[i].update(ok=True, id=img.pk)
+    created = [img for img in created if img is not None]
+    if created:
+        # bulk_create sends no post_save, so bump the counter here
+        adjust([event.pk], 'images_count', len(created))
+        enqueue_many('process_image', [{"image_id": img.pk} for img in created])
+    return report
+
+
+def _insert(rows):
+    """bulk_create `rows`; returns them with None for each one already in its gallery.
+
+    A concurrent upload of the same photo can insert it between the gallery
+    check and this INSERT. The (event, content_hash) constraint turns that
+    into an IntegrityError, and the rows are then inserted one at a time.
+    """
+    try:
+        with transaction.atomic():
+            return EventImage.objects.bulk_create(rows)
+    except IntegrityError:
+        pass
+    created = []
+    for row in rows:
+        try:
+            with transaction.atomic():
+                EventImage.objects.bulk_create([row])
+        except IntegrityError:
+            row = None
+        created.append(row)
+    return created
@@ -5,31 +5,65 @@ from django.contrib.auth import login
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import RegistrationForm
 from django.urls import reverse
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time, timezone as dt_timezone
 import json
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Event, Country, Community
+from .models import Event, EventOccurrence
 from .forms import EventForm, ProfileForm
 from .forms import EventFilterForm
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.db.models import Count, Max, Q, Sum
 from django.urls import reverse
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth import login as auth_login
 from .forms import NameLoginForm
 from .forms import EventImageForm
-from .models import EventImage
-from django.views.decorators.http import require_POST
-from django.http import HttpResponse
-import io, zipfile, os
+from .models import EventImage, BackgroundJob
+from .recurrence import iter_occurrences
+from .occurrences import sync_event_occurrences
+from .feed_cache import feed_cache_key, FEED_CACHE_TIMEOUT
+from .archives import stream_zip, archive_key, get_cached_archive, invalidate_event_archives
+from .renditions import RENDITION_FIELDS
+from .tasks import schedule_file_cleanup
+from .uploads import store_uploads
+from .counters import adjust
+from .pagination import keyset_page, encode_cursor, decode_cursor, row_position
+from .search import search_events
+from .reference import communities_asset_path, expand_groups, profile_country_id, reference_data
+from .targeting import targeted_event_ids
+from .delivery import serve_field_file, serve_file
+from .jobs import enqueue
+from django.core.cache import cache
+from django.views.decorators.http import require_POST, condition
+from django.utils.cache import patch_cache_control
+from django.http import HttpResponse, StreamingHttpResponse, Http404
+from django.core.serializers.json import DjangoJSONEncoder
+import os
 from django.utils.text import slugify
 from django.shortcuts import resolve_url
-from django.core.paginator import Paginator
-import uuid
+import hashlib
 
-# Bucharest sectors used in several places (calendar filters, events filtering, and forms)
-BUCHAREST_SECTORS = ['Sector 1', 'Sector 2', 'Sector 3', 'Sector 4', 'Sector 5', 'Sector 6']
+# images per gallery page (first page rendered, the rest fetched while scrolling)
+GALLERY_PAGE_SIZE = 60
+
+# fingerprinted assets never change under their URL
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# past participated/organized lists
+HISTORY_PAGE_SIZE = 10
+# ?count=1 counts at most this many rows
+HISTORY_COUNT_CAP = 1000
+
+# how far ahead recurring series are expanded when the feed is asked without an `end`
+RECURRENCE_HORIZON = timedelta(days=366)
+
+# rows fetched per round-trip while walking feed querysets
+FEED_CHUNK_SIZE = 2000
+# size of the pieces a streamed feed is written out in
+FEED_STREAM_BUFFER = 64 * 1024
 
 
 def home_view(request):
@@ -118,7 +152,9 @@ def login_view(request):
 
 def calendar_view(request):
     # pass available countries and communities for the calendar filters
-    countries = Country.objects.all().order_by('name')
+    # (served from the per-process reference cache, see events.reference)
+    ref = reference_data()
+    countries = ref.countries
     # determine communities to show in the calendar filters: if a country is selected
     # (either via query param or defaulted from the user's profile) only show communities
     # that belong to that country so users cannot pick communities from other countries.
@@ -130,42 +166,54 @@ def calendar_view(request):
     else:
         selected_country = ''
         if request.user.is_authenticated:
-            try:
-                prof_country = request.user.profile.country
-                if prof_country:
-                    selected_country = str(prof_country.id)
-            except Exception:
-                # no profile or no country set; leave as empty
-                selected_country = ''
+            # cached per user, so rendering the page costs no profile query
+            prof_country_id = profile_country_id(request.user)
+            if prof_country_id:
+                selected_country = str(prof_country_id)
 
     selected_community = request.GET.get('community', '')
-    # Build the communities queryset now that we know the selected_country
+    # Build the community options (groups first) now that we know the selected_country
     if selected_country:
         try:
             cid = int(selected_country)
-            communities = Community.objects.filter(country_id=cid).order_by('name')
+            community_menu = ref.community_menu(cid)
         except ValueError:
             # selected_country may be empty or not an integer; fall back to all
-            communities = Community.objects.all().order_by('name')
+            community_menu = ref.community_menu()
     else:
-        communities = Community.objects.all().order_by('name')
-    # define Bucharest sectors for the template to render the optgroup
-    sectors_list = BUCHAREST_SECTORS
-
-    # Also provide a JSON dump of all communities for client-side filtering
-    all_communities = list(Community.objects.values('id', 'name', 'country_id').order_by('name'))
+        community_menu = ref.community_menu()
 
     return render(request, "events/calendar.html", {
         "countries": countries,
-        "communities": communities,
+        "community_menu": community_menu,
         "selected_country": selected_country,
         "selected_community": selected_community,
-        "sectors_list": sectors_list,
-        "all_communities_json": json.dumps(all_communities),
-        "sectors_list_json": json.dumps(sectors_list),
+        # fingerprinted file, cached by the browser until the data changes
+        "communities_asset_url": ref.communities_asset_url,
     })
 
 
+def communities_asset(request, digest):
+    """Serve a published communities dataset (see events.reference).
+
+    The digest in the URL identifies the content, so responses are cacheable
+    forever. Superseded versions are served from disk while they are kept.
+    """
+    if len(digest) != 16 or set(digest) - set('0123456789abcdef'):
+        raise Http404('Unknown asset')
+    ref = reference_data()
+    path = communities_asset_path(digest)
+    if os.path.isfile(path):
+        response = serve_file(path, content_type='application/json')
+    elif digest == ref.communities_digest:
+        # the file couldn't be written (e.g. read-only disk); serve it from memory
+        response = HttpResponse(ref.communities_asset, content_type='application/json')
+    else:
+        raise Http404('Unknown asset')
+    patch_cache_control(response, public=True, max_age=ASSET_MAX_AGE, immutable=True)
+    return response
+
+
 @login_required
 def myevents_view(request):
     """List and create/delete events for the logged-in user."""
@@ -173,22 +221,16 @@ def myevents_view(request):
 
     # handle create
     if request.method == 'POST' and request.POST.get('action') == 'create':
-        # allow the special 'bucharest' aggregate value from the UI; expand it to the
-        # actual sector community ids so the ModelMultipleChoiceField accepts them.
-        posted = request.POST.copy()
-        if 'targeted_communities' in posted:
-            vals = posted.getlist('targeted_communities')
-            if 'bucharest' in vals:
-                sector_ids = list(Community.objects.filter(name__in=BUCHAREST_SECTORS).values_list('id', flat=True))
-                # remove the 'bucharest' token and append the numeric ids
-                new_vals = [v for v in vals if v != 'bucharest'] + [str(i) for i in sector_ids]
-                posted.setlist('targeted_communities', new_vals)
+        # the UI also offers community groups (by slug); expand them to their
+        # community ids so the ModelMultipleChoiceField accepts them.
+        posted = expand_groups(request.POST.copy())
 
         form = EventForm(posted, user=request.user)
         if form.is_valid():
             ev = form.save(commit=False)
             ev.owner = user
             ev.save()
+            sync_event_occurrences(ev)
             messages.success(request, 'Event created.')
             return redirect('myevents')
         else:
@@ -215,6 +257,8 @@ def myevents_view(request):
         ev.deleted_at = timezone.now()
         ev.deleted_by = user
         ev.save()
+        # drop its rows from the calendar feed
+        sync_event_occurrences(ev)
         messages.success(request, 'Event deleted (hidden).')
         return redirect('myevents')
     elif request.method == 'POST' and request.POST.get('action') == 'join':
@@ -234,12 +278,15 @@ def myevents_view(request):
 
     # Owned events and events where the user is listed as an organizer
     # Only show upcoming events that the user is hosting or organizing (end_time >= now)
+    # the organizers side is a subquery, as in organized_view: an OR across a
+    # join can't use either index and scans every live event
     now = timezone.now()
+    organized_ids = Event.organizers.through.objects.filter(user=user).values('event_id')
     events = Event.objects.filter(
-        Q(owner=user) | Q(organizers=user),
+        Q(owner=user) | Q(id__in=organized_ids),
         end_time__gte=now,
         is_deleted=False
-    ).distinct().order_by('start_time')
+    ).order_by('start_time')
 
     # Events where the user is a participant
     now = timezone.now()
@@ -247,8 +294,8 @@ def myevents_view(request):
     # participated (past) events are now shown on a separate page
     participated_past = Event.objects.none()
 
-    # pass communities and sectors list so the template can render the custom multi-select
-    communities = Community.objects.all().order_by('name')
+    # pass the community groups and communities so the template can render the custom multi-select
+    community_menu = reference_data().community_menu()
     # determine selected targeted communities to pre-select options in the template
     if request.method == 'POST' and request.POST.get('action') == 'create':
         # use the posted copy we prepared earlier if present
@@ -260,61 +307,313 @@ def myevents_view(request):
         "events": events,
         "participating": participating_upcoming,
         "form": form,
-        "communities": communities,
-        "sectors_list": BUCHAREST_SECTORS,
+        "community_menu": community_menu,
         "selected_targeted": selected_targeted,
     })
 
 
-def events_json(request):
-    data = []
-    qs = Event.objects.filter(is_deleted=False)
-    # apply optional filters from querystring
+def _parse_window_bound(value):
+    """Parse a FullCalendar `start`/`end` query value into a datetime.
+
+    FullCalendar sends ISO-8601 strings with an offset (or bare dates for
+    all-day views). Returns None for missing or unparseable values so callers
+    can treat that side of the window as unbounded.
+    """
+    if not value:
+        return None
+    # a literal '+' in the offset may arrive url-decoded as a space
+    value = value.strip().replace(' ', '+')
+    try:
+        dt = parse_datetime(value)
+        if dt is None:
+            d = parse_date(value)
+            if d is None:
+                return None
+            dt = datetime.combine(d, time.min)
+    except ValueError:
+        return None
+    # normalize to how the database hands datetimes back (UTC when USE_TZ)
+    if settings.USE_TZ:
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt)
+        dt = dt.astimezone(dt_timezone.utc)
+    elif timezone.is_aware(dt):
+        dt = timezone.make_naive(dt)
+    return dt
+
+
+def _feed_params(request):
+    """Normalize the feed's query parameters.
+
+    Returns (country_id, community, window_start, window_end) where
+    `community` is a community id, a CommunityGroup slug or None, and the
+    window comes from FullCalendar's `start`/`end` (its end is exclusive).
+    Unusable values are treated as absent.
+    """
+    country_id = None
+    community = None
     country = request.GET.get('country')
-    community = request.GET.get('community')
+    com = request.GET.get('community')
     if country:
         try:
-            cid = int(country)
-            qs = qs.filter(country_id=cid)
+            country_id = int(country)
         except ValueError:
             pass
-    if community:
-        # special aggregate for Bucharest which includes six sectors
-        if community == 'bucharest':
-            qs = qs.filter(targeted_communities__name__in=BUCHAREST_SECTORS)
+    if com:
+        try:
+            community = int(com)
+        except ValueError:
+            # a group (region, city, sectors...) stands for all of its communities
+            if com in reference_data().groups_by_slug:
+                community = com
+    window_start = _parse_window_bound(request.GET.get('start'))
+    window_end = _parse_window_bound(request.GET.get('end'))
+    return country_id, community, window_start, window_end
+
+
+def _scope_lookups(country_id, community, window_end=None):
+    """Translate the calendar's country/community filters into Event lookups.
+
+    A community filter is a semi-join on the EventTargeting side table
+    (`id IN (...)`), so it never repeats rows and needs no DISTINCT; events
+    starting after `window_end` can't show up and are cut off in the index.
+    """
+    scope = {}
+    if country_id is not None:
+        scope['country_id'] = country_id
+    if isinstance(community, str):
+        # group members come from the closure table via the reference cache,
+        # so no join to Community is needed
+        community_ids = reference_data().group_community_ids(community) or []
+        scope['id__in'] = targeted_event_ids(community_ids, starting_before=window_end)
+    elif community is not None:
+        scope['id__in'] = targeted_event_ids([community], starting_before=window_end)
+    return scope
+
+
+def _feed_entry(ev, day, occ_start, occ_end, participants):
+    # combine the occurrence's times with the day it is shown on; "joined" is
+    # per-user and filled in by events_json
+    return {
+        "id": f"{ev.id}-{day.isoformat()}",
+        "orig_id": ev.id,
+        "title": ev.title,
+        "start": datetime.combine(day, occ_start.time()).isoformat(),
+        "end": datetime.combine(day, occ_end.time()).isoformat(),
+        "description": ev.description,
+        "type": ev.event_type.name if ev.event_type else None,
+        "participants": participants,
+        "joined": False,
+        "location": ev.location,
+    }
+
+
+def _feed_querysets(country_id, community, window_start, window_end):
+    """Return the (occurrences, open-series tail) querysets behind a feed.
+
+    Days come straight from the materialized EventOccurrence table with an
+    indexed range scan. Open-ended series are only materialized up to their
+    `occurrences_until`; the tail holds those expanded lazily past it.
+    """
+    scope = _scope_lookups(country_id, community, window_end)
+    first_day = window_start.date() if window_start else None
+    last_day = (window_end - timedelta(microseconds=1)).date() if window_end else None
+
+    occurrences = EventOccurrence.objects.filter(
+        event__is_deleted=False,
+        **{f'event__{k}': v for k, v in scope.items()}
+    )
+    if first_day:
+        occurrences = occurrences.filter(day__gte=first_day)
+    if last_day:
+        occurrences = occurrences.filter(day__lte=last_day)
+
+    # never expand an open-ended series without an upper bound
+    series_end = window_end or (window_start or timezone.now()) + RECURRENCE_HORIZON
+    tail = Event.objects.filter(
+        is_deleted=False,
+        occurrences_until__isnull=False,
+        occurrences_until__lt=series_end,
+        **scope
+    )
+    return occurrences, tail
+
+
+def _feed_entries(country_id, community, window_start, window_end):
+    """Yield the shared calendar feed entries (one per event-day)."""
+    first_day = window_start.date() if window_start else None
+    last_day = (window_end - timedelta(microseconds=1)).date() if window_end else None
+    series_end = window_end or (window_start or timezone.now()) + RECURRENCE_HORIZON
+    occurrences, tail = _feed_querysets(country_id, community, window_start, window_end)
+
+    occurrences = occurrences.select_related('event', 'event__event_type')
+    for occ in occurrences.order_by('day', 'start_time').iterator(chunk_size=FEED_CHUNK_SIZE):
+        yield _feed_entry(occ.event, occ.day, occ.start_time, occ.end_time, occ.event.participants_count)
+
+    tail = tail.select_related('event_type')
+    for e in tail.order_by('start_time').iterator(chunk_size=FEED_CHUNK_SIZE):
+        lower = max(window_start, e.occurrences_until) if window_start else e.occurrences_until
+        for occ_start, occ_end in iter_occurrences(e, lower, series_end):
+            if occ_start < e.occurrences_until:
+                # already materialized
+                continue
+            current = max(occ_start.date(), first_day) if first_day else occ_start.date()
+            end_date = min(occ_end.date(), last_day) if last_day else occ_end.date()
+            while current <= end_date:
+                yield _feed_entry(e, current, occ_start, occ_end, e.participants_count)
+                current = current + timedelta(days=1)
+
+
+def _joined_event_ids(request):
+    """Ids of the events the current user participates in (memoized per request)."""
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, '_joined_event_ids'):
+        # one indexed lookup on the participants table instead of a flag per row
+        request._joined_event_ids = frozenset(
+            Event.participants.through.objects.filter(user_id=request.user.id).values_list('event_id', flat=True)
+        )
+    return request._joined_event_ids
+
+
+def _merge_joined(entries, joined_ids):
+    """Return `entries` with "joined" set for the events in `joined_ids`."""
+    if not joined_ids:
+        return entries
+    return [dict(entry, joined=True) if entry["orig_id"] in joined_ids else entry for entry in entries]
+
+
+def _feed_body_key(request):
+    """Cache key of the shared feed body for this request (memoized per request).
+
+    The scope version counters only move in the cache they live in: never
+    under DummyCache, and only in the saving process under LocMemCache. So
+    the key also carries a stamp read from the database - count, id sum,
+    latest update and participant total of the rows the feed is built
+    from - and a change made anywhere still yields a new key.
+    """
+    if not hasattr(request, '_feed_body_key'):
+        params = _feed_params(request)
+        occurrences, tail = _feed_querysets(*params)
+        stamp = [
+            *occurrences.aggregate(
+                Count('id'), Sum('event_id'), Max('event__updated_at'), Sum('event__participants_count'),
+            ).values(),
+            *tail.aggregate(Count('id'), Sum('id'), Max('updated_at'), Sum('participants_count')).values(),
+        ]
+        raw = '|'.join(str(v) for v in stamp)
+        request._feed_body_key = f"{feed_cache_key(*params)}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+    return request._feed_body_key
+
+
+def _events_json_etag(request):
+    """Validator for the feed, computed from aggregates instead of the entries.
+
+    The body cache key changes whenever anything in the requested scope
+    changes (see _feed_body_key); adding the user's participations covers
+    the per-user "joined" flags.
+    """
+    key = _feed_body_key(request)
+    joined = ','.join(str(i) for i in sorted(_joined_event_ids(request)))
+    # the compact layout is a different representation of the same data
+    fmt = request.GET.get('format', '')
+    return hashlib.md5(f"{key}|{joined}|{fmt}".encode('utf-8')).hexdigest()
+
+
+# per-event columns of the compact feed; "type" holds an index into "types"
+COMPACT_FEED_COLUMNS = ("id", "title", "description", "location", "type", "participants", "joined")
+
+
+def _compact_feed(entries, joined_ids):
+    """Re-encode expanded feed entries in the compact columnar layout.
+
+    Each event is sent once as a row across COMPACT_FEED_COLUMNS, event
+    type names are dictionary-encoded in "types", distinct [start, end]
+    times of day in "times", and "occurrences" lists [event index, day,
+    times index] triples that the calendar expands client-side. Times are
+    kept per occurrence because a series' times move across DST changes.
+    Payload size follows the number of distinct events rather than
+    event-days.
+    """
+    events = {name: [] for name in COMPACT_FEED_COLUMNS}
+    types = []
+    type_index = {}
+    times = []
+    times_index = {}
+    index = {}
+    occurrences = []
+    for entry in entries:
+        eid = entry["orig_id"]
+        i = index.get(eid)
+        if i is None:
+            i = index[eid] = len(events["id"])
+            type_name = entry["type"]
+            if type_name is not None and type_name not in type_index:
+                type_index[type_name] = len(types)
+                types.append(type_name)
+            events["id"].append(eid)
+            events["title"].append(entry["title"])
+            events["description"].append(entry["description"])
+            events["location"].append(entry["location"])
+            events["type"].append(type_index.get(type_name))
+            events["participants"].append(entry["participants"])
+            events["joined"].append(eid in joined_ids)
+        day, start = entry["start"].split('T', 1)
+        pair = (start, entry["end"].split('T', 1)[1])
+        t = times_index.get(pair)
+        if t is None:
+            t = times_index[pair] = len(times)
+            times.append(list(pair))
+        occurrences.append([i, day, t])
+    return {"events": events, "types": types, "times": times, "occurrences": occurrences}
+
+
+def _stream_json_array(entries, joined_ids):
+    """Yield `entries` as a JSON array in FEED_STREAM_BUFFER-sized pieces."""
+    buf = ['[']
+    size = 1
+    first = True
+    for entry in entries:
+        if entry["orig_id"] in joined_ids:
+            entry["joined"] = True
+        piece = ('' if first else ',') + json.dumps(entry, cls=DjangoJSONEncoder)
+        first = False
+        buf.append(piece)
+        size += len(piece)
+        if size >= FEED_STREAM_BUFFER:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    buf.append(']')
+    yield ''.join(buf)
+
+
+@condition(etag_func=_events_json_etag)
+def events_json(request):
+    params = _feed_params(request)
+    compact = request.GET.get('format') == 'compact'
+    if request.GET.get('stream') == '1' and not compact:
+        # wide ranges: write entries out while the querysets are still being
+        # walked, so memory stays flat and the first byte goes out immediately.
+        # Streamed bodies bypass the feed cache.
+        response = StreamingHttpResponse(
+            _stream_json_array(_feed_entries(*params), _joined_event_ids(request)),
+            content_type='application/json',
+        )
+    else:
+        # the shared body is identical for everyone asking for the same scope and window
+        key = _feed_body_key(request)
+        entries = cache.get(key)
+        if entries is None:
+            entries = list(_feed_entries(*params))
+            cache.set(key, entries, FEED_CACHE_TIMEOUT)
+        if compact:
+            response = JsonResponse(_compact_feed(entries, _joined_event_ids(request)))
         else:
-            try:
-                comid = int(community)
-                qs = qs.filter(targeted_communities__id=comid)
-            except ValueError:
-                pass
-
-    # avoid duplicates when filtering across M2M
-    qs = qs.distinct()
-
-    for e in qs.order_by('start_time'):
-        # expand multi-day events into per-day entries so they appear on each day in the calendar
-        start_date = e.start_time.date()
-        end_date = e.end_time.date()
-        current = start_date
-        while current <= end_date:
-            # combine the original times with the current date
-            start_dt = datetime.combine(current, e.start_time.time())
-            end_dt = datetime.combine(current, e.end_time.time())
-            data.append({
-                "id": f"{e.id}-{current.isoformat()}",
-                "orig_id": e.id,
-                "title": e.title,
-                "start": start_dt.isoformat(),
-                "end": end_dt.isoformat(),
-                "description": e.description,
-                "type": e.event_type.name if e.event_type else None,
-                "participants": e.participants.count(),
-                "joined": request.user.is_authenticated and e.participants.filter(id=request.user.id).exists(),
-                "location": e.location,
-            })
-            current = current + timedelta(days=1)
-    return JsonResponse(data, safe=False)
+            response = JsonResponse(_merge_joined(entries, _joined_event_ids(request)), safe=False)
+    # let clients keep the body but always revalidate it with If-None-Match
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 def participate_event(request, event_id):
@@ -334,17 +633,18 @@ def participate_event(request, event_id):
     else:
         return JsonResponse({"error": "invalid_action"}, status=400)
 
+    # the counter was updated in the database by the m2m_changed handler
+    ev.refresh_from_db(fields=['participants_count'])
     return JsonResponse({
         "joined": ev.participants.filter(id=request.user.id).exists(),
-        "participants": ev.participants.count()
+        "participants": ev.participants_count
     })
 
 
 def event_detail(request, event_id):
     ev = get_object_or_404(Event, id=event_id, is_deleted=False)
 
-    # images and upload form
-    images = ev.images.all()
+    # upload form; the gallery button shows the denormalized images_count
     upload_form = EventImageForm()
 
     # handle join/leave from the detail page
@@ -363,7 +663,7 @@ def event_detail(request, event_id):
             messages.success(request, 'You have left this event.')
             return redirect(reverse('event_detail', args=[ev.id]))
 
-    return render(request, 'events/event_detail.html', {'event': ev, 'now': timezone.now(), 'images': images, 'upload_form': upload_form})
+    return render(request, 'events/event_detail.html', {'event': ev, 'now': timezone.now(), 'upload_form': upload_form})
 
 
 @login_required
@@ -373,80 +673,131 @@ def upload_event_image(request, event_id):
     ev = get_object_or_404(Event, id=event_id, is_deleted=False)
     # support multiple files via input name="images" (and fall back to single 'image')
     files = request.FILES.getlist('images') or ([] if 'image' not in request.FILES else [request.FILES.get('image')])
-    uploaded = 0
-    for f in files:
-        try:
-            # generate a randomized filename to avoid collisions
-            original_name = getattr(f, 'name', '')
-            _, ext = os.path.splitext(original_name or '')
-            if not ext:
-                # default to .jpg if extension missing
-                ext = '.jpg'
-            f.name = f"{uuid.uuid4().hex}{ext}"
-            img = EventImage(event=ev, image=f, uploaded_by=request.user)
-            img.save()
-            uploaded += 1
-        except Exception:
-            # skip invalid files but continue processing others
-            continue
+    # files are checked and written in parallel and recorded with one INSERT;
+    # decoding, EXIF handling and renditions happen in the background worker
+    report = store_uploads(ev, files, request.user)
+    uploaded = sum(1 for r in report if r["ok"])
+    if uploaded:
+        # cached "all photos" archives no longer match the gallery
+        invalidate_event_archives(ev.id)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        # the drag-and-drop UI shows the outcome of every file
+        return JsonResponse({'uploaded': uploaded, 'results': report})
 
     if uploaded:
-        messages.success(request, f"Uploaded {uploaded} photo{'' if uploaded==1 else 's'}.")
+        messages.success(request, f"Uploaded {uploaded} photo{'' if uploaded==1 else 's'}. They will appear once processed.")
     else:
         messages.error(request, 'Failed to upload photo(s). Please ensure the files are valid images.')
     # send user back to the gallery view (so they can see uploaded images)
     return redirect(resolve_url('event_gallery', event_id=event_id) + '#upload')
 
 
+def _gallery_page(ev, user, cursor=None):
+    """One keyset page of an event's images, newest first, plus the next cursor.
+
+    Each image gets `show_original`: whether `user` may open its original.
+    """
+    images, position = keyset_page(ev.images.all(), ('created_at', 'id'), decode_cursor(cursor),
+                                   limit=GALLERY_PAGE_SIZE, descending=True)
+    for img in images:
+        img.show_original = img.original_visible_to(user)
+    return images, (encode_cursor(position) if position else None)
+
+
 def event_gallery(request, event_id):
     ev = get_object_or_404(Event, id=event_id, is_deleted=False)
-    images = ev.images.all()
-    return render(request, 'events/event_gallery.html', {'event': ev, 'images': images})
+    # render the first page; the rest is loaded from gallery_images_json while scrolling
+    images, next_cursor = _gallery_page(ev, request.user)
+    return render(request, 'events/event_gallery.html', {'event': ev, 'images': images, 'next_cursor': next_cursor})
+
+
+def gallery_images_json(request, event_id):
+    """Keyset-paginated JSON listing of an event's images (`?cursor=` from the previous page)."""
+    ev = get_object_or_404(Event, id=event_id, is_deleted=False)
+    images, next_cursor = _gallery_page(ev, request.user, request.GET.get('cursor'))
+    items = [{
+        "id": img.id,
+        "status": img.status,
+        "url": img.url if img.show_original else None,
+        "filename": img.filename,
+        "thumbnail": img.thumbnail_url if img.thumbnail else None,
+        "srcset": img.srcset,
+        "webp_srcset": img.webp_srcset,
+        "width": img.width,
+        "height": img.height,
+    } for img in images]
+    return JsonResponse({"items": items, "next": next_cursor})
+
+
+def event_image_file(request, event_id, image_id, variant):
+    """Deliver one stored variant of a gallery image (see events.delivery).
+
+    Anyone who can see the gallery may fetch its files; images of deleted
+    events are not served, and originals that are not processed yet (or
+    failed) only to their uploader.
+    """
+    field = EventImage.FILE_VARIANTS.get(variant)
+    if field is None:
+        raise Http404('Unknown variant')
+    img = get_object_or_404(EventImage, id=image_id, event_id=event_id, event__is_deleted=False)
+    if field == 'image' and not img.original_visible_to(request.user):
+        raise Http404('Image not available')
+    response = serve_field_file(getattr(img, field), filename=img.filename if field == 'image' else None)
+    if field == 'image':
+        # access to the original depends on its status and the requester
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        # renditions are written under a fresh name each time they are generated
+        patch_cache_control(response, public=True, max_age=86400)
+    return response
 
 
 @login_required
 @require_POST
 def download_selected_images(request, event_id):
-    """Bundle selected EventImage files into a ZIP and return as an attachment.
+    """Bundle selected EventImage files into a ZIP attachment.
 
-    Expects POST with selected_images as repeated parameters (e.g. selected_images=1&selected_images=2).
-    Only images that belong to the specified event are included.
+    Expects POST with selected_images as repeated parameters (e.g. selected_images=1&selected_images=2),
+    or all=1 for the whole gallery. Only images that belong to the specified event are included,
+    and of those only processed ones plus the requester's own uploads.
+    Archives already in the on-disk cache are served from there. A miss gets a streamed
+    copy; for all=1, the selection worth keeping, a cached one is also queued for building.
     """
     ev = get_object_or_404(Event, id=event_id, is_deleted=False)
+    download_all = request.POST.get('all') == '1'
     ids = request.POST.getlist('selected_images')
-    if not ids:
+    if not ids and not download_all:
         # nothing selected — redirect back with a message
         from django.contrib import messages
         messages.error(request, 'No images were selected for download.')
         return redirect(reverse('event_gallery', args=[event_id]))
 
-    imgs = EventImage.objects.filter(id__in=ids, event=ev)
-    if not imgs.exists():
+    # unprocessed or failed uploads only go to their uploader (see EventImage.original_visible_to)
+    imgs = EventImage.objects.filter(Q(status='ready') | Q(uploaded_by=request.user), event=ev)
+    if not download_all:
+        imgs = imgs.filter(id__in=ids)
+    members = list(imgs.values_list('id', 'content_hash', 'image'))
+    if not members:
         from django.contrib import messages
         messages.error(request, 'No valid images found to download.')
         return redirect(reverse('event_gallery', args=[event_id]))
 
-    # create ZIP in memory
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-        existing = set()
-        for img in imgs:
-            try:
-                fname = os.path.basename(img.image.name)
-                # avoid duplicate names inside the archive
-                arcname = fname
-                if arcname in existing:
-                    arcname = f"{img.id}-{fname}"
-                existing.add(arcname)
-                with img.image.open('rb') as fh:
-                    zf.writestr(arcname, fh.read())
-            except Exception:
-                # skip files we can't read and continue
-                continue
-
-    buf.seek(0)
     download_name = f"{slugify(ev.title) or 'event'}-images.zip"
-    response = HttpResponse(buf.getvalue(), content_type='application/zip')
+    # popular archives (e.g. "all photos") are built once and served from disk
+    key = archive_key(members)
+    cached = get_cached_archive(ev.id, key)
+    if cached:
+        return serve_file(cached, filename=download_name, as_attachment=True, content_type='application/zip')
+    # ad-hoc selections are rarely requested twice; only the whole gallery is worth building
+    if download_all and not BackgroundJob.objects.filter(
+        kind='build_archive', status__in=('queued', 'running'), payload__key=key
+    ).exists():
+        enqueue('build_archive', event_id=ev.id, image_ids=[m[0] for m in members], key=key)
+
+    # meanwhile stream the archive: files are read in chunks and the ZIP is emitted
+    # as it is built, so memory stays bounded by the chunk size, not the archive size
+    response = StreamingHttpResponse(stream_zip(imgs.iterator()), content_type='application/zip')
     response['Content-Disposition'] = f'attachment; filename="{download_name}"'
     return response
 
@@ -473,17 +824,19 @@ def delete_selected_images(request, event_id):
             ids = []
 
     imgs = EventImage.objects.filter(id__in=ids, event=ev)
-    deleted = []
-    for img in imgs:
-        # allow delete if owner of event, uploader, or superuser
-        if request.user.is_superuser or request.user == ev.owner or request.user == img.uploaded_by:
-            try:
-                # remove file from storage first
-                img.image.delete(save=False)
-            except Exception:
-                pass
-            deleted.append(str(img.id))
-            img.delete()
+    # allow delete if owner of event, uploader, or superuser; the check is part of
+    # the query so uploaders are never loaded
+    if not (request.user.is_superuser or ev.owner_id == request.user.id):
+        imgs = imgs.filter(uploaded_by=request.user)
+    rows = list(imgs.values_list('id', 'image', *RENDITION_FIELDS))
+    deleted = [str(row[0]) for row in rows]
+    if rows:
+        # one DELETE for the rows; the files are removed later by the worker
+        EventImage.objects.filter(id__in=[row[0] for row in rows]).delete()
+        # like store_uploads, keep the counter here rather than in a signal
+        adjust([ev.pk], 'images_count', -len(rows))
+        schedule_file_cleanup([name for row in rows for name in row[1:] if name])
+        invalidate_event_archives(ev.id)
 
     from django.http import JsonResponse
     from django.contrib import messages
@@ -511,14 +864,8 @@ def event_edit(request, event_id):
         return redirect('calendar')
 
     if request.method == 'POST':
-        # expand 'bucharest' aggregate into the actual sector ids before binding the form
-        posted = request.POST.copy()
-        if 'targeted_communities' in posted:
-            vals = posted.getlist('targeted_communities')
-            if 'bucharest' in vals:
-                sector_ids = list(Community.objects.filter(name__in=BUCHAREST_SECTORS).values_list('id', flat=True))
-                new_vals = [v for v in vals if v != 'bucharest'] + [str(i) for i in sector_ids]
-                posted.setlist('targeted_communities', new_vals)
+        # expand community group slugs into their community ids before binding the form
+        posted = expand_groups(request.POST.copy())
 
         form = EventForm(posted, instance=ev, user=request.user)
         if form.is_valid():
@@ -530,15 +877,15 @@ def event_edit(request, event_id):
     else:
         form = EventForm(instance=ev, user=request.user)
 
-    # supply communities and sectors_list for the custom multi-select rendering and
+    # supply the community groups and communities for the custom multi-select rendering and
     # compute selected_targeted to pre-select options (from POST when bound, else from instance)
-    communities = Community.objects.all().order_by('name')
+    community_menu = reference_data().community_menu()
     if request.method == 'POST':
         selected_targeted = posted.getlist('targeted_communities') if 'posted' in locals() else request.POST.getlist('targeted_communities')
     else:
         selected_targeted = [str(c.id) for c in ev.targeted_communities.all()]
 
-    return render(request, 'events/event_edit.html', {'form': form, 'event': ev, 'communities': communities, 'sectors_list': BUCHAREST_SECTORS, 'selected_targeted': selected_targeted})
+    return render(request, 'events/event_edit.html', {'form': form, 'event': ev, 'community_menu': community_menu, 'selected_targeted': selected_targeted})
 
 
 
@@ -574,34 +921,10 @@ def participated_view(request):
     """Show events the user has participated in (past events)."""
     user = request.user
     now = timezone.now()
-    # apply filters from GET
-    form = EventFilterForm(request.GET or None)
     participated_qs = Event.objects.filter(participants=user, end_time__lt=now, is_deleted=False)
-    if form.is_valid():
-        name = form.cleaned_data.get('name')
-        location = form.cleaned_data.get('location')
-        ev_type = form.cleaned_data.get('event_type')
-        if name:
-            participated_qs = participated_qs.filter(title__icontains=name)
-        if location:
-            participated_qs = participated_qs.filter(location__icontains=location)
-        if ev_type:
-            participated_qs = participated_qs.filter(event_type=ev_type)
-
-    participated_qs = participated_qs.order_by('-start_time')
-
-    # pagination
-    paginator = Paginator(participated_qs, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # build GET params without page to preserve filters in pagination links
-    params = request.GET.copy()
-    if 'page' in params:
-        params.pop('page')
-    get_params = params.urlencode()
-
-    return render(request, 'events/participated.html', {'participated': page_obj.object_list, 'form': form, 'page_obj': page_obj, 'get_params': get_params})
+    context = _history_page(request, participated_qs)
+    context['participated'] = context['events']
+    return render(request, 'events/participated.html', context)
 
 
 @login_required
@@ -609,39 +932,109 @@ def organized_view(request):
     """Show past events where the user was the owner or an organizer."""
     user = request.user
     now = timezone.now()
-    # include events where the user is the owner or listed in the organizers M2M
+    # include events where the user is the owner or listed in the organizers M2M;
+    # the organizers side is a subquery rather than a join, so no DISTINCT is needed
+    organized_ids = Event.organizers.through.objects.filter(user=user).values('event_id')
     organized_qs = Event.objects.filter(
-        Q(owner=user) | Q(organizers=user),
+        Q(owner=user) | Q(id__in=organized_ids),
         end_time__lt=now,
         is_deleted=False
-    ).distinct()
+    )
+    context = _history_page(request, organized_qs)
+    context['organized'] = context['events']
+    return render(request, 'events/organized.html', context)
 
-    # apply filters from GET
-    form = EventFilterForm(request.GET or None)
+
+def _filter_events(qs, form):
+    """Apply the EventFilterForm fields to `qs`."""
     if form.is_valid():
         name = form.cleaned_data.get('name')
         location = form.cleaned_data.get('location')
         ev_type = form.cleaned_data.get('event_type')
+        # full-text index lookups instead of unindexable icontains scans
         if name:
-            organized_qs = organized_qs.filter(title__icontains=name)
+            qs = search_events(qs, name, fields=('title',))
         if location:
-            organized_qs = organized_qs.filter(location__icontains=location)
+            qs = search_events(qs, location, fields=('location',))
         if ev_type:
-            organized_qs = organized_qs.filter(event_type=ev_type)
+            qs = qs.filter(event_type=ev_type)
+    return qs
 
-    organized_qs = organized_qs.order_by('-start_time')
 
-    # pagination
-    paginator = Paginator(organized_qs, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def _history_cursor(token):
+    """Decode a history cursor; None unless it has the shape _history_page issues.
 
-    params = request.GET.copy()
-    if 'page' in params:
-        params.pop('page')
-    get_params = params.urlencode()
+    Cursors come back from the client, so a tampered one is treated like a
+    missing one instead of reaching the form or the keyset filter.
+    """
+    cursor = decode_cursor(token)
+    if not isinstance(cursor, dict):
+        return None
+    after = cursor.get('after')
+    filters = cursor.get('filters', {})
+    if not isinstance(cursor.get('back', False), bool) or not isinstance(filters, dict):
+        return None
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in filters.items()):
+        return None
+    if after is not None:
+        # (start_time isoformat, id), see row_position
+        if not (isinstance(after, list) and len(after) == 2 and isinstance(after[0], str)
+                and type(after[1]) is int):
+            return None
+        try:
+            if parse_datetime(after[0]) is None:
+                return None
+        except ValueError:
+            return None
+    return cursor
+
+
+def _history_page(request, qs):
+    """Keyset-paginate a past-events list, newest first.
 
-    return render(request, 'events/organized.html', {'organized': page_obj.object_list, 'form': form, 'page_obj': page_obj, 'get_params': get_params})
+    Pages are addressed by an opaque `cursor` carrying the (start_time, id)
+    key of the row to continue from, the direction and the filter values,
+    so page N is one range scan like page 1. The total is only counted when
+    asked for (?count=1), and then capped at HISTORY_COUNT_CAP.
+    """
+    cursor = _history_cursor(request.GET.get('cursor'))
+    # a cursor keeps the filters it was issued for; a plain request takes them from GET
+    filters = cursor.get('filters') if cursor else request.GET
+    form = EventFilterForm(filters or None)
+    qs = _filter_events(qs, form)
+    # raw submitted values (event_type as its id) so they round-trip through JSON
+    filters = {k: form.data.get(k) for k in form.fields if form.data.get(k)} if form.is_valid() else {}
+
+    fields = ('start_time', 'id')
+    position = cursor.get('after') if cursor else None
+    if cursor and cursor.get('back'):
+        # walk towards newer events, then flip the page back into display order
+        rows, newer = keyset_page(qs, fields, position, HISTORY_PAGE_SIZE)
+        rows.reverse()
+        has_previous, has_next = newer is not None, True
+    else:
+        rows, older = keyset_page(qs, fields, position, HISTORY_PAGE_SIZE, descending=True)
+        has_previous, has_next = position is not None, older is not None
+
+    def link(row, back):
+        return encode_cursor({'after': row_position(row, fields), 'back': back, 'filters': filters})
+
+    total = None
+    if request.GET.get('count') == '1':
+        total = qs.order_by().values('id')[:HISTORY_COUNT_CAP + 1].count()
+    params = request.GET.copy()
+    params['count'] = '1'
+
+    return {
+        'events': rows,
+        'form': form,
+        'next_cursor': link(rows[-1], False) if rows and has_next else None,
+        'previous_cursor': link(rows[0], True) if rows and has_previous else None,
+        'total': total,
+        'total_capped': total is not None and total > HISTORY_COUNT_CAP,
+        'count_cap': HISTORY_COUNT_CAP,
+        'count_query': params.urlencode(),
+    }
 
 
 @login_required
@@ -0,0 +1,31 @@
+"""Entry points of the `run_worker` process pool.
+
+Pool processes are spawned fresh and import this module to find their
+initializer, before Django is set up; so nothing from the events app may
+be imported at module level here (loading models would raise
+AppRegistryNotReady). `events.jobs` is imported inside the functions.
+"""
+import django
+
+
+def init_process(database_names):
+    """Set up Django in a pool process, using the parent's databases.
+
+    `database_names` maps each alias to the database NAME the parent is
+    connected to, which differs from settings under the test runner.
+    """
+    django.setup()
+    from django.db import connections
+
+    for alias, name in database_names.items():
+        connections[alias].settings_dict['NAME'] = name
+
+
+def run(job_id):
+    from django.db import close_old_connections
+    from events.jobs import run_job
+
+    try:
+        return job_id, run_job(job_id)
+    finally:
+        close_old_connections()
@@ -20,7 +20,8 @@ from django.contrib.auth.views import LogoutView
 from django.views.generic.base import RedirectView
 from events.views import home_view, calendar_view, events_json, myevents_view, register_view, event_detail, participate_event, event_edit, edit_profile
 from events.views import participated_view, mark_attendance, organized_view, upload_event_image, event_gallery
-from events.views import download_selected_images, delete_selected_images
+from events.views import download_selected_images, delete_selected_images, gallery_images_json, event_image_file
+from events.views import communities_asset
 from events.views import download_selected_images
 from django.conf import settings
 from django.conf.urls.static import static
@@ -41,9 +42,12 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
     path("calendar/", calendar_view, name="calendar"),
     path("events-json/", events_json, name="events_json"),
+    path("assets/communities-<str:digest>.json", communities_asset, name="communities_asset"),
     path("events/<int:event_id>/", event_detail, name="event_detail"),
         path("events/<int:event_id>/edit/", event_edit, name="event_edit"),
     path("events/<int:event_id>/gallery/", event_gallery, name="event_gallery"),
+    path("events/<int:event_id>/gallery/images/", gallery_images_json, name="event_gallery_images"),
+    path("events/<int:event_id>/gallery/images/<int:image_id>/<str:variant>/", event_image_file, name="event_image_file"),
     path("events/<int:event_id>/download-selected/", download_selected_images, name='download_event_images'),
     path("events/<int:event_id>/delete-selected/", delete_selected_images, name='delete_event_images'),
     path("events/<int:event_id>/upload-image/", upload_event_image, name="upload_event_image"),